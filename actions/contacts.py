@@ -0,0 +1,149 @@
+import difflib
+import json
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+from .. import db, settings
+from ..textnorm import normalize
+
+
+_KV_KEY = "whatsapp.contacts"
+
+# One round trip: the first titled span of each chat-list row is the chat name
+# (later ones are message previews). Falls back to every titled span.
+_EXTRACT_JS = """
+(root) => {
+  const rows = root.querySelectorAll("[role='listitem'], [role='row']");
+  let titles = Array.from(rows, r => {
+    const s = r.querySelector("span[title]");
+    return s ? s.getAttribute("title") : null;
+  });
+  if (!titles.length) titles = Array.from(root.querySelectorAll("span[title]"), s => s.getAttribute("title"));
+  return titles.filter(Boolean);
+}
+"""
+
+
+async def visible_chats(page: "Page", root: str = "#pane-side") -> List[str]:
+    """Titles of the chats currently rendered under ``root``."""
+    try:
+        return await page.eval_on_selector(root, _EXTRACT_JS)
+    except Exception:
+        return []
+
+
+class ContactIndex:
+    """Known WhatsApp chat titles, kept in the ``kv`` table.
+
+    Grows incrementally from bulk extractions of the chat list and resolves
+    user-typed names locally (accent folding + ranked fuzzy matching), so a
+    send can usually click the chat directly instead of searching for it.
+    """
+
+    def __init__(self) -> None:
+        self._titles: Dict[str, str] = {}  # normalized -> display title
+        self._loaded = False
+        self.refreshed_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        raw = db.kv_get(_KV_KEY)
+        if not raw:
+            return
+        try:
+            data = json.loads(raw)
+            for title in data.get("titles", []):
+                self._titles[normalize(title)] = title
+            self.refreshed_at = float(data.get("refreshed_at", 0.0))
+        except Exception:
+            self._titles.clear()
+
+    def _save(self) -> None:
+        db.kv_set(
+            _KV_KEY,
+            json.dumps({"titles": sorted(self._titles.values()), "refreshed_at": self.refreshed_at}, ensure_ascii=False),
+        )
+
+    def merge(self, titles: List[str]) -> int:
+        """Add new titles; returns how many were new."""
+        self._load()
+        added = 0
+        for title in titles:
+            key = normalize(title)
+            if key and self._titles.get(key) != title:
+                added += key not in self._titles
+                self._titles[key] = title
+        self.refreshed_at = time.time()
+        self._save()
+        return added
+
+    def stale(self) -> bool:
+        self._load()
+        return time.time() - self.refreshed_at > settings.CONTACT_INDEX_REFRESH_S
+
+    async def refresh(self, page: "Page", force: bool = False) -> int:
+        if not force and not self.stale():
+            return 0
+        return self.merge(await visible_chats(page))
+
+    def rank(self, query: str, titles: Optional[List[str]] = None, n: int = 5) -> List[Tuple[str, float]]:
+        self._load()
+        q = normalize(query)
+        if not q:
+            return []
+        pool = {normalize(t): t for t in titles} if titles is not None else self._titles
+        q_tokens = q.split(" ")
+        scored: List[Tuple[str, float]] = []
+        for key, title in pool.items():
+            if key == q:
+                score = 1.0
+            elif key.startswith(q):
+                score = 0.92
+            else:
+                tokens = key.split(" ")
+                if all(any(t.startswith(qt) for t in tokens) for qt in q_tokens):
+                    score = 0.88
+                else:
+                    score = difflib.SequenceMatcher(None, q, key).ratio() * 0.85
+            scored.append((title, score))
+        scored.sort(key=lambda x: x[1], reverse=True)
+        return scored[:n]
+
+    def exact(self, query: str, titles: Optional[List[str]] = None) -> Optional[str]:
+        """The title equal to ``query`` once normalized, if any."""
+        self._load()
+        q = normalize(query)
+        if titles is not None:
+            return next((t for t in titles if normalize(t) == q), None) if q else None
+        return self._titles.get(q) if q else None
+
+    def resolve(self, query: str, titles: Optional[List[str]] = None) -> Optional[str]:
+        """Best matching title, or None when nothing is close or it is a tie."""
+        ranked = self.rank(query, titles, n=2)
+        if not ranked or ranked[0][1] < settings.CONTACT_MATCH_MIN:
+            self.misses += 1
+            return None
+        if len(ranked) > 1 and ranked[0][1] < 1.0 and ranked[0][1] - ranked[1][1] < 0.02:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ranked[0][0]
+
+    def stats(self) -> Dict[str, Any]:
+        self._load()
+        return {
+            "contacts": len(self._titles),
+            "refreshed_at": self.refreshed_at,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+contact_index = ContactIndex()
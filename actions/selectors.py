@@ -0,0 +1,149 @@
+import asyncio
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from playwright.async_api import Locator, Page
+
+from .. import db, settings
+
+
+class SelectorStats:
+    """Which candidate selector won, per site and step, persisted in ``kv``."""
+
+    def __init__(self) -> None:
+        self._wins: Dict[str, Dict[str, int]] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _key(self, site: str, step: str) -> str:
+        return f"{site}:{step}"
+
+    def _load(self, key: str) -> Dict[str, int]:
+        if key not in self._wins:
+            wins: Dict[str, int] = {}
+            raw = db.kv_get(f"selectors:{key}")
+            if raw:
+                try:
+                    wins = {str(k): int(v) for k, v in json.loads(raw).items()}
+                except Exception:
+                    wins = {}
+            self._wins[key] = wins
+            self._counters[key] = {"fast_hits": 0, "races": 0, "failures": 0}
+        return self._wins[key]
+
+    def ordered(self, site: str, step: str, candidates: List[str]) -> List[str]:
+        wins = self._load(self._key(site, step))
+        return sorted(candidates, key=lambda s: (-wins.get(s, 0), candidates.index(s)))
+
+    def best(self, site: str, step: str) -> Optional[str]:
+        wins = self._load(self._key(site, step))
+        return max(wins, key=wins.get) if wins else None
+
+    def record(self, site: str, step: str, selector: str, counter: str) -> None:
+        key = self._key(site, step)
+        wins = self._load(key)
+        before = self.best(site, step)
+        wins[selector] = wins.get(selector, 0) + 1
+        self._counters[key][counter] += 1
+        # Persist when the leader changes, and periodically otherwise.
+        if before != selector or wins[selector] % 20 == 1:
+            db.kv_set(f"selectors:{key}", json.dumps(wins))
+
+    def demote(self, site: str, step: str, selector: str) -> None:
+        """Forget a winner that went stale so it stops being tried first."""
+        key = self._key(site, step)
+        wins = self._load(key)
+        if wins.pop(selector, None) is not None:
+            db.kv_set(f"selectors:{key}", json.dumps(wins))
+
+    def failed(self, site: str, step: str) -> None:
+        key = self._key(site, step)
+        self._load(key)
+        self._counters[key]["failures"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {k: {"wins": dict(self._wins[k]), **self._counters[k]} for k in self._wins}
+
+
+selector_stats = SelectorStats()
+
+
+def _locate(page: "Page", selector: str, pick: str) -> "Locator":
+    loc = page.locator(selector)
+    return loc.last if pick == "last" else loc.first
+
+
+async def resolve(
+    page: "Page",
+    site: str,
+    step: str,
+    candidates: List[str],
+    timeout_ms: int = 5000,
+    pick: str = "first",
+    state: str = "visible",
+) -> Optional[Tuple["Locator", str]]:
+    """Find the first candidate selector present on the page.
+
+    The selector that won last time is tried alone for a short moment; if it
+    has not appeared yet, all candidates are raced concurrently (it still
+    first) and the first to appear wins (an earlier-listed candidate appearing
+    within the grace period is preferred, so generic fallbacks do not beat
+    specific selectors on ties). The previous winner is only forgotten when
+    another candidate wins the race, not on a slow render. Returns None if
+    nothing matched within ``timeout_ms``.
+    """
+    best = selector_stats.best(site, step)
+    if best in candidates:
+        loc = _locate(page, best, pick)
+        try:
+            await loc.wait_for(state=state, timeout=settings.SELECTOR_FAST_MS)
+            selector_stats.record(site, step, best, "fast_hits")
+            return loc, best
+        except Exception:
+            pass
+
+    ordered = selector_stats.ordered(site, step, candidates)
+    tasks: Dict["asyncio.Task[Any]", str] = {
+        asyncio.ensure_future(_locate(page, sel, pick).wait_for(state=state, timeout=timeout_ms)): sel
+        for sel in ordered
+    }
+    rank = {sel: i for i, sel in enumerate(ordered)}
+    winner: Optional[str] = None
+    try:
+        pending = set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            ok = [tasks[t] for t in done if not t.cancelled() and t.exception() is None]
+            if ok:
+                winner = min(ok, key=rank.__getitem__)
+        if winner is not None:
+            better = [t for t in pending if rank[tasks[t]] < rank[winner]]
+            if better:
+                done, _ = await asyncio.wait(better, timeout=settings.SELECTOR_GRACE_MS / 1000)
+                ok = [tasks[t] for t in done if not t.cancelled() and t.exception() is None]
+                if ok:
+                    winner = min(ok + [winner], key=rank.__getitem__)
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if winner is None:
+        selector_stats.failed(site, step)
+        return None
+    if best in candidates and winner != best:
+        selector_stats.demote(site, step, best)
+    selector_stats.record(site, step, winner, "races")
+    return _locate(page, winner, pick), winner
+
+
+async def click_first(page: "Page", site: str, step: str, candidates: List[str], timeout_ms: int = 3000) -> bool:
+    found = await resolve(page, site, step, candidates, timeout_ms=timeout_ms)
+    if found is None:
+        return False
+    try:
+        await found[0].click(timeout=timeout_ms)
+        return True
+    except Exception:
+        return False
@@ -1,26 +1,93 @@
-import asyncio
-from typing import Optional
+import re
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from urllib.parse import quote
 
-from playwright.async_api import Page
+if TYPE_CHECKING:
+    from playwright.async_api import Page, Response
 
+from .. import db
+from ..textnorm import normalize
+from .selectors import click_first
+from .timing import step
+from .waits import response_after, visible_any
 
-async def _try_click(page: Page, selectors: list[str], timeout_ms: int = 3000) -> bool:
-    for sel in selectors:
-        try:
-            await page.click(sel, timeout=timeout_ms)
-            return True
-        except Exception:
-            continue
-    return False
 
+SPOTIFY_URL = "https://open.spotify.com"
+
+_LOGIN_BUTTON = "[data-testid='login-button'], button:has-text('Log in')"
+# Either the login button (logged out) or the account widget (logged in).
+_SESSION_MARKERS = f"{_LOGIN_BUTTON}, [data-testid='user-widget-link']"
+
+# Links worth remembering: what a query resolved to.
+_ENTITY_RE = re.compile(r"^/(?:intl-[a-z-]+/)?(?:track|album|playlist|artist)/[A-Za-z0-9]+$")
+
+# href of the top result card (what the first play button plays), falling
+# back to the first entity link in the results.
+_TOP_RESULT_JS = """
+() => {
+  const sel = "a[href*='/track/'], a[href*='/album/'], a[href*='/playlist/'], a[href*='/artist/']";
+  const card = document.querySelector("[data-testid='top-result-card']");
+  const a = (card && card.querySelector(sel)) || document.querySelector("main " + sel);
+  return a ? a.getAttribute("href") : null;
+}
+"""
+
+_ROW_LINK_JS = "(row) => { const a = row.querySelector(\"a[href*='/track/']\"); return a ? a.getAttribute('href') : null; }"
+
+
+def _is_search_response(resp: "Response") -> bool:
+    # Web player search goes through the pathfinder GraphQL endpoint.
+    url = resp.url
+    return "pathfinder" in url and "search" in url.lower()
+
+
+class TrackCache:
+    """Normalized query -> Spotify track/album/playlist path, in ``kv``.
+
+    A repeat query navigates straight to the remembered page and presses its
+    play button instead of searching again.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def _key(self, query: str) -> str:
+        return "spotify.q:" + normalize(query)
+
+    def get(self, query: str) -> Optional[str]:
+        path = db.kv_get(self._key(query))
+        if path:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return path
+
+    def put(self, query: str, path: Optional[str]) -> None:
+        path = (path or "").split("?")[0]
+        if normalize(query) and _ENTITY_RE.match(path):
+            db.kv_set(self._key(query), path)
+
+    def forget(self, query: str) -> None:
+        self.invalidated += 1
+        db.kv_delete(self._key(query))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "invalidated": self.invalidated}
 
-async def ensure_logged_in(page: Page) -> bool:
+
+track_cache = TrackCache()
+
+
+async def ensure_logged_in(page: "Page") -> bool:
     """Best-effort detection: returns True if user seems logged in."""
     # Spotify changes often; this is heuristic.
     try:
-        await page.wait_for_timeout(500)
+        with step("spotify", "session_check"):
+            await visible_any(page, _SESSION_MARKERS)
         # If "Log in" button exists, probably not logged.
-        loc = page.locator("text=Log in")
+        loc = page.locator(_LOGIN_BUTTON)
         if await loc.count() > 0:
             return False
     except Exception:
@@ -28,32 +95,30 @@ async def ensure_logged_in(page: Page) -> bool:
     return True
 
 
-async def play(page: Page, query: str) -> None:
-    # Open Search
-    await page.goto("https://open.spotify.com/search", wait_until="domcontentloaded")
-    # Search input changes; try a few selectors
-    input_selectors = [
-        "input[data-testid='search-input']",
-        "input[placeholder*='What do you want to play']",
-        "input[placeholder*='¿Qué quieres escuchar']",
-        "input[type='search']",
+async def _play_cached(page: "Page", path: str) -> bool:
+    """Open a remembered track/album/playlist page and press its play button."""
+    with step("spotify", "open_cached"):
+        await page.goto(SPOTIFY_URL + path, wait_until="domcontentloaded")
+    entity_play = [
+        "[data-testid='action-bar-row'] button[data-testid='play-button']",
+        "[data-testid='action-bar'] button[data-testid='play-button']",
+        "button[data-testid='play-button']",
     ]
+    with step("spotify", "play_click"):
+        return await click_first(page, "spotify", "entity_play", entity_play, timeout_ms=4000)
 
-    search_input = None
-    for sel in input_selectors:
-        try:
-            search_input = page.locator(sel)
-            await search_input.wait_for(timeout=5000)
-            break
-        except Exception:
-            search_input = None
 
-    if search_input is None:
-        raise RuntimeError("No encontré el input de búsqueda en Spotify")
-
-    await search_input.fill(query)
-    await page.keyboard.press("Enter")
-    await page.wait_for_timeout(1200)
+async def _play_search(page: "Page", query: str) -> Optional[str]:
+    """Play the top search result; returns the path of what was played."""
+    # The /search/<query> deep link runs the search on load: no input to find
+    # and nothing to type. Wait for the search XHR instead of a fixed delay;
+    # the play-button lookup below still waits for the results to render.
+    with step("spotify", "search"):
+        await response_after(
+            page,
+            lambda: page.goto(f"{SPOTIFY_URL}/search/{quote(query, safe='')}", wait_until="domcontentloaded"),
+            _is_search_response,
+        )
 
     # Click first result that looks like a track/play button
     # Prefer a play button in the top results.
@@ -63,17 +128,37 @@ async def play(page: Page, query: str) -> None:
         "button[aria-label^='Reproducir']",
     ]
 
-    clicked = await _try_click(page, play_selectors, timeout_ms=4000)
+    with step("spotify", "play_click"):
+        clicked = await click_first(page, "spotify", "play_button", play_selectors, timeout_ms=4000)
     if clicked:
-        return
+        try:
+            return await page.evaluate(_TOP_RESULT_JS)
+        except Exception:
+            return None
 
     # Fallback: click first track row then hit space
     try:
-        first_row = page.locator("[data-testid='tracklist-row']").first
-        await first_row.click(timeout=4000)
-        await page.keyboard.press("Space")
-        return
+        with step("spotify", "row_fallback"):
+            first_row = page.locator("[data-testid='tracklist-row']").first
+            await first_row.click(timeout=4000)
+            await page.keyboard.press("Space")
     except Exception:
-        pass
+        raise RuntimeError("No pude iniciar la reproducción en Spotify")
+    try:
+        return await first_row.evaluate(_ROW_LINK_JS)
+    except Exception:
+        return None
+
+
+async def play(page: "Page", query: str) -> None:
+    path = track_cache.get(query)
+    if path:
+        try:
+            if await _play_cached(page, path):
+                return
+        except Exception:
+            pass
+        # The page moved or no longer plays: search again and relearn.
+        track_cache.forget(query)
 
-    raise RuntimeError("No pude iniciar la reproducción en Spotify")
+    track_cache.put(query, await _play_search(page, query))
@@ -0,0 +1,64 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator
+
+from .. import metrics
+
+
+class StepTimings:
+    """Duration of each browser-action step, per site, kept in memory.
+
+    A bounded window of recent samples per ``site.step`` gives percentiles
+    without growing; totals and errors are kept since startup.
+    """
+
+    def __init__(self, window: int = 200) -> None:
+        self._window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counters: Dict[str, Dict[str, float]] = {}
+
+    def record(self, site: str, step: str, ms: float, ok: bool = True) -> None:
+        key = f"{site}.{step}"
+        if key not in self._samples:
+            self._samples[key] = deque(maxlen=self._window)
+            self._counters[key] = {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+        self._samples[key].append(ms)
+        c = self._counters[key]
+        c["count"] += 1
+        c["total_ms"] += ms
+        c["max_ms"] = max(c["max_ms"], ms)
+        if not ok:
+            c["errors"] += 1
+        metrics.ACTION_STEP_SECONDS.observe(ms / 1000, site=site, step=step, outcome="ok" if ok else "error")
+
+    @contextmanager
+    def step(self, site: str, step: str) -> Iterator[None]:
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(site, step, (time.perf_counter() - started) * 1000, ok)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for key, samples in self._samples.items():
+            c = self._counters[key]
+            ordered = sorted(samples)
+            n = len(ordered)
+            out[key] = {
+                "count": int(c["count"]),
+                "errors": int(c["errors"]),
+                "avg_ms": round(c["total_ms"] / c["count"], 1),
+                "p50_ms": round(ordered[n // 2], 1),
+                "p95_ms": round(ordered[min(n - 1, int(n * 0.95))], 1),
+                "max_ms": round(c["max_ms"], 1),
+                "last_ms": round(samples[-1], 1),
+            }
+        return out
+
+
+step_timings = StepTimings()
+step = step_timings.step
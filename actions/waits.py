@@ -0,0 +1,96 @@
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page, Response
+
+from .. import settings
+
+
+# Installs a MutationObserver on ``root`` and stores a promise on window that
+# resolves true once the subtree has changed and then stayed quiet for
+# ``quiet`` ms, or false after ``max`` ms without any change.
+_ARM_JS = """
+([key, root, quiet, max]) => {
+  const el = document.querySelector(root);
+  window[key] = new Promise(resolve => {
+    if (!el) return resolve(false);
+    let timer = null;
+    const finish = (v) => { obs.disconnect(); clearTimeout(timer); clearTimeout(cap); resolve(v); };
+    const obs = new MutationObserver(() => {
+      clearTimeout(timer);
+      timer = setTimeout(() => finish(true), quiet);
+    });
+    const cap = setTimeout(() => finish(timer !== null), max);
+    obs.observe(el, {childList: true, subtree: true, characterData: true, attributes: true});
+  });
+  return !!el;
+}
+"""
+
+
+class Settle:
+    """Wait for a DOM subtree to change and settle after an interaction.
+
+    Arm it *before* the action that triggers the update so the first mutation
+    is never missed::
+
+        settle = await Settle.arm(page, "#pane-side")
+        await search.fill(name)
+        await settle.wait()
+    """
+
+    def __init__(self, page: "Page", key: str, armed: bool) -> None:
+        self.page = page
+        self.key = key
+        self.armed = armed
+
+    @classmethod
+    async def arm(cls, page: "Page", root: str, timeout_ms: Optional[int] = None) -> "Settle":
+        key = "__jarvisSettle_" + "".join(c if c.isalnum() else "_" for c in root)
+        try:
+            armed = await page.evaluate(
+                _ARM_JS,
+                [key, root, settings.WAIT_SETTLE_MS, timeout_ms or settings.WAIT_TIMEOUT_MS],
+            )
+        except Exception:
+            armed = False
+        return cls(page, key, bool(armed))
+
+    async def wait(self) -> bool:
+        """True if the subtree changed and settled; False on timeout."""
+        if not self.armed:
+            return False
+        try:
+            return bool(await self.page.evaluate(f"() => window[{self.key!r}]"))
+        except Exception:
+            return False
+
+
+async def visible_any(page: "Page", selector: str, timeout_ms: Optional[int] = None) -> bool:
+    """Wait until any element matching ``selector`` is visible."""
+    try:
+        await page.locator(selector).first.wait_for(state="visible", timeout=timeout_ms or settings.WAIT_TIMEOUT_MS)
+        return True
+    except Exception:
+        return False
+
+
+async def response_after(
+    page: "Page",
+    action: Callable[[], Any],
+    predicate: Callable[["Response"], bool],
+    timeout_ms: Optional[int] = None,
+) -> bool:
+    """Run ``action`` and wait for the first network response matching
+    ``predicate`` (e.g. the search XHR). False if none arrived in time;
+    errors raised by ``action`` itself propagate.
+    """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    try:
+        async with page.expect_response(predicate, timeout=timeout_ms or settings.WAIT_TIMEOUT_MS) as info:
+            await action()
+        await info.value
+        return True
+    except PlaywrightTimeoutError:
+        return False
@@ -1,23 +1,37 @@
-import re
-import unicodedata
+from typing import TYPE_CHECKING, Optional
 
-from playwright.async_api import Page
+if TYPE_CHECKING:
+    from playwright.async_api import Page
 
+from ..textnorm import normalize as _normalize_name
+from .contacts import contact_index, visible_chats
+from .selectors import resolve
+from .timing import step
+from .waits import Settle, visible_any
 
-def _normalize_name(s: str) -> str:
-    s = s.strip().lower()
-    s = unicodedata.normalize("NFD", s)
-    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
-    s = re.sub(r"\s+", " ", s)
-    return s
 
+WHATSAPP_URL = "https://web.whatsapp.com/"
 
-async def _wait_for_chat_ui(page: Page) -> None:
-    # On WhatsApp Web, the main app container is usually present.
-    await page.wait_for_timeout(500)
 
+class PartialSend(Exception):
+    """The first ``sent`` messages went out before ``error`` stopped the rest,
+    so a retry must resend only what follows."""
 
-async def ensure_logged_in(page: Page) -> bool:
+    def __init__(self, sent: int, error: BaseException) -> None:
+        super().__init__(str(error))
+        self.sent = sent
+        self.error = error
+
+# The chat list once logged in, or the QR code canvas when not.
+_APP_READY = "#pane-side, div[data-ref] canvas, canvas[aria-label]"
+
+
+async def _wait_for_chat_ui(page: "Page") -> None:
+    # Ready as soon as either the chat list or the login QR is on screen.
+    await visible_any(page, _APP_READY)
+
+
+async def ensure_logged_in(page: "Page") -> bool:
     # If QR canvas is present, likely not logged in.
     try:
         if await page.locator("canvas").count() > 0 and await page.locator("text=Scan me").count() > 0:
@@ -32,9 +46,52 @@ async def ensure_logged_in(page: Page) -> bool:
         return False
 
 
-async def open_chat(page: Page, contact: str) -> None:
-    await page.goto("https://web.whatsapp.com/", wait_until="domcontentloaded")
-    await _wait_for_chat_ui(page)
+async def ensure_app(page: "Page") -> None:
+    """Load WhatsApp Web only if this page is not already on it."""
+    if page.url.startswith(WHATSAPP_URL):
+        return
+    with step("whatsapp", "load_app"):
+        await page.goto(WHATSAPP_URL, wait_until="domcontentloaded")
+        await _wait_for_chat_ui(page)
+
+
+async def current_chat(page: "Page") -> Optional[str]:
+    """Title of the chat open in the conversation pane, if any."""
+    try:
+        header = page.locator("#main header span[title]").first
+        if await header.count() == 0:
+            return None
+        return await header.get_attribute("title")
+    except Exception:
+        return None
+
+
+async def open_chat(page: "Page", contact: str) -> None:
+    with step("whatsapp", "open_chat"):
+        await _open_chat(page, contact)
+
+
+async def _open_chat(page: "Page", contact: str) -> None:
+    await ensure_app(page)
+
+    # Already talking to them: nothing to navigate.
+    title = await current_chat(page)
+    if title and _normalize_name(title) == _normalize_name(contact):
+        return
+
+    # Skip the search only for an exact (normalized) name already rendered in
+    # the chat list: the index only knows visible chats, so a fuzzy hit there
+    # ("Juan" -> "Juana Pérez") may not be the contact the user meant.
+    await contact_index.refresh(page)
+    target = contact_index.exact(contact)
+    if target:
+        row = page.locator("#pane-side").get_by_title(target, exact=True).first
+        try:
+            if await row.count() > 0:
+                await row.click(timeout=3000)
+                return
+        except Exception:
+            pass
 
     # Try to focus search box: WhatsApp uses a contenteditable div for search.
     search_candidates = [
@@ -43,77 +100,83 @@ async def open_chat(page: Page, contact: str) -> None:
         "div[contenteditable='true'][role='textbox']",
     ]
 
-    search = None
-    for sel in search_candidates:
-        loc = page.locator(sel).first
-        try:
-            await loc.wait_for(timeout=4000)
-            search = loc
-            break
-        except Exception:
-            continue
-
-    if search is None:
+    with step("whatsapp", "search_box"):
+        found = await resolve(page, "whatsapp", "search_box", search_candidates, timeout_ms=4000)
+    if found is None:
         raise RuntimeError("No encontré la caja de búsqueda de WhatsApp (¿no has iniciado sesión?)")
-
-    await search.click()
-    await search.fill(contact)
-    await page.wait_for_timeout(1200)
-
-    # Click first result
-    # WhatsApp results are listitems; we'll click a span with title matching, else first chat.
-    try:
-        exact = page.locator(f"span[title='{contact}']").first
-        if await exact.count() > 0:
-            await exact.click(timeout=3000)
-            return
-    except Exception:
-        pass
-
-    # Fuzzy fallback: find any span[title] in results and click first
-    spans = page.locator("span[title]")
-    n = await spans.count()
-    target_norm = _normalize_name(contact)
-    best_idx = None
-    for i in range(min(n, 25)):
-        title = await spans.nth(i).get_attribute("title")
-        if not title:
-            continue
-        if _normalize_name(title) == target_norm:
-            best_idx = i
-            break
-    if best_idx is None and n > 0:
-        best_idx = 0
-
-    if best_idx is None:
+    search = found[0]
+
+    # The chat list re-renders with the results: wait for it to change and
+    # settle rather than sleeping a fixed amount.
+    with step("whatsapp", "search"):
+        await search.click()
+        settle = await Settle.arm(page, "#pane-side")
+        await search.fill(contact)
+        await settle.wait()
+
+    # Pull every result title in one round trip and learn them; pick the
+    # exact title, else the best ranked one, else the first result.
+    titles = await visible_chats(page)
+    if not titles:
         raise RuntimeError("No encontré ese contacto/chat en WhatsApp")
+    contact_index.merge(titles)
+    best = contact_index.exact(contact, titles) or contact_index.resolve(contact, titles) or titles[0]
+    await page.locator("#pane-side").get_by_title(best, exact=True).first.click(timeout=3000)
 
-    await spans.nth(best_idx).click(timeout=3000)
-
-
-async def send_message(page: Page, contact: str, message: str) -> None:
-    await open_chat(page, contact)
 
-    # message box
+async def _message_box(page: "Page"):
     box_candidates = [
         "div[contenteditable='true'][data-tab='10']",
         "div[contenteditable='true'][data-tab='9']",
         "footer div[contenteditable='true']",
         "div[contenteditable='true'][role='textbox']",
     ]
-    box = None
-    for sel in box_candidates:
-        loc = page.locator(sel).last
-        try:
-            await loc.wait_for(timeout=4000)
-            box = loc
-            break
-        except Exception:
-            continue
-
-    if box is None:
+    found = await resolve(page, "whatsapp", "message_box", box_candidates, timeout_ms=4000, pick="last")
+    if found is None:
         raise RuntimeError("No encontré la caja para escribir el mensaje")
+    return found[0]
+
+
+async def send_messages(page: "Page", contact: str, messages: list[str]) -> None:
+    """Open the chat once and send each message in order.
 
-    await box.click()
-    await box.fill(message)
-    await page.keyboard.press("Enter")
+    Raises PartialSend if it fails after at least one message went out.
+    """
+    await open_chat(page, contact)
+
+    with step("whatsapp", "message_box"):
+        box = await _message_box(page)
+    with step("whatsapp", "type_send"):
+        sent = 0
+        try:
+            for i, message in enumerate(messages):
+                if message:
+                    await box.click()
+                    await box.fill(message)
+                    await page.keyboard.press("Enter")
+                sent = i + 1
+        except Exception as e:
+            if sent:
+                raise PartialSend(sent, e) from e
+            raise
+
+
+async def send_message(page: "Page", contact: str, message: str) -> None:
+    await send_messages(page, contact, [message])
+
+
+async def send_batch(page: "Page", items: list[tuple[str, list[str]]]) -> list[Optional[Exception]]:
+    """Send to several contacts in one pass over the already-loaded app.
+
+    Returns one entry per item: None on success, the exception otherwise, so
+    a failing contact does not stop the rest.
+    """
+    await ensure_app(page)
+    results: list[Optional[Exception]] = []
+    for contact, messages in items:
+        try:
+            await send_messages(page, contact, messages)
+            results.append(None)
+        except Exception as e:
+            results.append(e)
+    return results
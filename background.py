@@ -1,31 +1,165 @@
 import asyncio
-from datetime import datetime, timezone
+import heapq
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
 
-from . import db
+from . import db, settings
+from .bus import event_bus
+from .plan_cache import plan_cache
 
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-async def reminder_loop(stop_event: asyncio.Event) -> None:
+def parse_ts(ts_iso: str) -> datetime:
+    dt = datetime.fromisoformat(str(ts_iso).strip())
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+class Scheduler:
+    """Fires reminders and alarms from an in-memory min-heap.
+
+    Pending rows are loaded once at startup; afterwards the loop sleeps until
+    the earliest due time and never polls SQLite. New items must go through
+    :meth:`add_reminder` / :meth:`add_alarm` (on the event loop) so an item
+    due earlier than the current head wakes the loop immediately.
+    """
+
+    def __init__(self) -> None:
+        # (due, seq, kind, row id, text)
+        self._heap: List[Tuple[datetime, int, str, int, str]] = []
+        self._seq = 0
+        self._wake = asyncio.Event()
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def next_due(self) -> Optional[datetime]:
+        return self._heap[0][0] if self._heap else None
+
+    def _push(self, kind: str, row_id: int, text: str, due: datetime) -> None:
+        self._seq += 1
+        head = self.next_due()
+        heapq.heappush(self._heap, (due, self._seq, kind, row_id, text))
+        if head is None or due < head:
+            self._wake.set()
+
+    def load(self) -> None:
+        self._heap.clear()
+        for kind, rows in (("reminder", db.pending_reminders()), ("alarm", db.active_alarms())):
+            for row in rows:
+                text = row["text"] if kind == "reminder" else (row["label"] or "alarm")
+                try:
+                    due = parse_ts(row["run_at"])
+                except ValueError:
+                    self._discard_invalid(kind, int(row["id"]), row["run_at"])
+                    continue
+                self._push(kind, int(row["id"]), text, due)
+        self._loaded = True
+
+    def _discard_invalid(self, kind: str, row_id: int, run_at: str) -> None:
+        if kind == "reminder":
+            db.mark_reminder_fired(row_id)
+        else:
+            db.deactivate_alarm(row_id)
+        db.add_event(now_iso(), f"{kind}.err", f"run_at inválido ({row_id}): {run_at}")
+
+    def add_reminder(self, text: str, run_at_iso: str) -> int:
+        due = parse_ts(run_at_iso)
+        row_id = db.add_reminder(text=text, run_at_iso=due.isoformat())
+        self._push("reminder", row_id, text, due)
+        return row_id
+
+    def add_alarm(self, label: str, run_at_iso: str) -> int:
+        due = parse_ts(run_at_iso)
+        row_id = db.add_alarm(label=label, run_at_iso=due.isoformat())
+        self._push("alarm", row_id, label or "alarm", due)
+        return row_id
+
+    def _fire(self, kind: str, row_id: int, text: str) -> None:
+        try:
+            if kind == "reminder":
+                if db.mark_reminder_fired(row_id):
+                    db.add_event(now_iso(), "reminder", text)
+            else:
+                # For now alarms just emit an event; you can extend to run wakeup routine.
+                if db.deactivate_alarm(row_id):
+                    db.add_event(now_iso(), "alarm", text)
+        except Exception as e:
+            db.add_event(now_iso(), f"{kind}.err", str(e))
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        if not self._loaded:
+            self.load()
+        while not stop_event.is_set():
+            now = datetime.now(timezone.utc)
+            while self._heap and self._heap[0][0] <= now:
+                _, _, kind, row_id, text = heapq.heappop(self._heap)
+                self._fire(kind, row_id, text)
+
+            # Sleep until the head is due; the cap only bounds clock drift,
+            # waking up re-checks the heap without touching the database.
+            delay = settings.SCHEDULER_MAX_SLEEP_S
+            head = self.next_due()
+            if head is not None:
+                delay = min(delay, max(0.0, (head - now).total_seconds()))
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        head = self.next_due()
+        return {"pending": len(self._heap), "next_due": head.isoformat() if head else None}
+
+
+scheduler = Scheduler()
+
+
+async def retention_loop(stop_event: asyncio.Event) -> None:
+    """Periodically archive old events so the live table stays small."""
+    if settings.EVENTS_RETENTION_INTERVAL_S <= 0:
+        return
     while not stop_event.is_set():
         try:
-            for row in db.due_reminders(now_iso()):
-                db.mark_reminder_fired(int(row["id"]))
-                db.add_event(now_iso(), "reminder", row["text"])
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=settings.EVENTS_RETENTION_DAYS)).isoformat()
+            moved = await asyncio.to_thread(
+                db.archive_events, cutoff, settings.EVENTS_KEEP_ROWS, settings.EVENTS_ARCHIVE_BATCH
+            )
+            if moved:
+                db.add_event(now_iso(), "retention", f"{moved} eventos archivados")
+            await asyncio.to_thread(db.queue_prune, settings.QUEUE_KEEP_S)
+            await asyncio.to_thread(plan_cache.prune)
         except Exception as e:
-            db.add_event(now_iso(), "reminder.err", str(e))
-        await asyncio.sleep(5)
+            db.add_event(now_iso(), "retention.err", str(e))
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=settings.EVENTS_RETENTION_INTERVAL_S)
+        except asyncio.TimeoutError:
+            pass
+
 
+async def events_tail(stop_event: asyncio.Event) -> None:
+    """Publish new rows of the events table on this process's bus.
 
-async def alarm_loop(stop_event: asyncio.Event) -> None:
-    # For now alarms just emit an event; you can extend to run wakeup routine.
+    Used in the api role, where actions run in the worker process and their
+    events never pass through this process's ``db.add_event``.
+    """
+    newest = await asyncio.to_thread(db.list_events, 1)
+    last_id = newest[0]["id"] if newest else 0
     while not stop_event.is_set():
         try:
-            for row in db.due_alarms(now_iso()):
-                db.deactivate_alarm(int(row["id"]))
-                db.add_event(now_iso(), "alarm", row.get("label") or "alarm")
+            for row in await asyncio.to_thread(db.list_events, 500, last_id):
+                ev = dict(row)
+                last_id = ev["id"]
+                event_bus.publish(ev)
         except Exception as e:
-            db.add_event(now_iso(), "alarm.err", str(e))
-        await asyncio.sleep(5)
+            db.add_event(now_iso(), "events.tail.err", str(e))
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=settings.EVENTS_TAIL_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
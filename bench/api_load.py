@@ -0,0 +1,124 @@
+"""Concurrent load on /api/message with a stub planner.
+
+Drives the FastAPI app in-process (httpx ASGI transport, no network) while
+``llm_plan`` is replaced by a stub that sleeps ``--llm-ms`` and returns a plan
+with ``--actions`` reminder actions, so the request path, the orchestrator and
+the database are exercised without a provider. Usage::
+
+    python -m <package>.bench.api_load [--requests 500] [--concurrency 20] [--llm-ms 300]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from .. import settings
+from .common import print_table, summarize
+
+
+def _in_flight(stats: Dict[str, Any]) -> bool:
+    lanes = [v for v in stats.values() if isinstance(v, dict) and "depth" in v]
+    return any(lane["depth"] or lane["busy"] for lane in lanes)
+
+
+async def _bench(n: int, concurrency: int, llm_ms: float, actions: int) -> Dict[str, Any]:
+    try:
+        import httpx
+    except ImportError:
+        raise SystemExit("api_load necesita httpx (pip install httpx)")
+
+    from .. import main as app_main
+    from ..orchestrator import orchestrator
+
+    samples: Dict[str, List[float]] = {"planner (stub)": [], "request": [], "request - planner": []}
+    planner_s: Dict[str, float] = {}
+    far = (datetime.now(timezone.utc) + timedelta(days=365)).isoformat()
+
+    async def fake_plan(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        await asyncio.sleep(llm_ms / 1000)
+        text = messages[-1]["content"]
+        plan = {
+            "response": "ok",
+            "actions": [
+                {"name": "reminder.add", "args": {"text": f"{text} #{k}", "run_at": far}, "priority": 50}
+                for k in range(actions)
+            ],
+            "constraints": {},
+            "source": "llm",
+        }
+        planner_s[text] = time.perf_counter() - t0
+        return plan
+
+    # Queue wait and run time of every action the requests enqueue.
+    dispatch = orchestrator._dispatch
+
+    async def timed_dispatch(action: Any) -> None:
+        samples.setdefault("action wait", []).append(time.time() - action.enqueued_at)
+        t0 = time.perf_counter()
+        try:
+            await dispatch(action)
+        finally:
+            samples.setdefault("action run", []).append(time.perf_counter() - t0)
+
+    app_main.llm_plan = fake_plan
+    orchestrator._dispatch = timed_dispatch  # type: ignore[method-assign]
+
+    await app_main._startup()
+    sem = asyncio.Semaphore(concurrency)
+    try:
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            headers = {"Authorization": f"Bearer {settings.API_BEARER_TOKEN}"} if settings.API_BEARER_TOKEN else {}
+
+            async def one(i: int) -> None:
+                text = f"bench {i}"
+                async with sem:
+                    t0 = time.perf_counter()
+                    r = await client.post("/api/message", json={"text": text}, headers=headers)
+                    elapsed = time.perf_counter() - t0
+                r.raise_for_status()
+                samples["request"].append(elapsed)
+                samples["planner (stub)"].append(planner_s[text])
+                samples["request - planner"].append(elapsed - planner_s[text])
+
+            wall0 = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(n)))
+            wall = time.perf_counter() - wall0
+
+        # Let the orchestrator drain what the requests enqueued.
+        while _in_flight(orchestrator.stats()):
+            await asyncio.sleep(0.01)
+    finally:
+        await app_main._shutdown()
+    return {"samples": samples, "wall": wall}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--requests", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--llm-ms", type=float, default=300.0, help="stub planner latency")
+    ap.add_argument("--actions", type=int, default=1, help="reminder actions per plan")
+    args = ap.parse_args()
+
+    original_dir = settings.DATA_DIR
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            settings.DATA_DIR = data_dir
+            out = asyncio.run(_bench(args.requests, args.concurrency, args.llm_ms, args.actions))
+    finally:
+        settings.DATA_DIR = original_dir
+
+    rows = []
+    for label, xs in out["samples"].items():
+        # Throughput over the whole run for requests, per-sample otherwise.
+        row: Dict[str, object] = {"stage": label, **summarize(xs, out["wall"] if label == "request" else 0.0)}
+        rows.append(row)
+    print_table(rows, ["stage", "n", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "ops_s"])
+
+
+if __name__ == "__main__":
+    main()
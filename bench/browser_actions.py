@@ -0,0 +1,103 @@
+"""End-to-end benchmark for the browser actions against local fixtures.
+
+Serves look-alike WhatsApp and Spotify pages (``bench/fixtures``) from a local
+HTTP server and runs the real ``actions.spotify.play`` and
+``actions.whatsapp.send_message`` on them in headless Chromium, reporting
+per-action and per-step latency. Usage::
+
+    python -m <package>.bench.browser_actions [--n 30] [--api-ms 80]
+
+Needs the Playwright Chromium build (``playwright install chromium``).
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from typing import Dict, List
+
+from .. import db, settings
+from ..actions import spotify, whatsapp
+from ..actions.timing import step_timings
+from .common import print_table, summarize
+from .sites import FixtureServer
+
+# Names a user would type, some only reachable through search (the list
+# renders the first 30 chats).
+_CONTACTS = ["Contacto 003", "Contacto 017", "Contacto 120", "contacto 150", "Contacto 199"]
+_QUERIES = ["bohemian rhapsody", "despacito", "lofi beats", "la bamba", "clair de lune"]
+
+
+def _record_steps(samples: Dict[str, List[float]]) -> None:
+    """Collect every step duration (the stats window only keeps recent ones)."""
+    record = step_timings.record
+
+    def wrapped(site: str, step: str, ms: float, ok: bool = True) -> None:
+        samples.setdefault(f"step {site}.{step}", []).append(ms / 1000)
+        record(site, step, ms, ok)
+
+    step_timings.record = wrapped  # type: ignore[method-assign]
+
+
+async def _time(samples: Dict[str, List[float]], label: str, coro) -> None:
+    t0 = time.perf_counter()
+    await coro
+    samples.setdefault(label, []).append(time.perf_counter() - t0)
+
+
+async def _bench(n: int, server: FixtureServer) -> Dict[str, List[float]]:
+    from playwright.async_api import async_playwright
+
+    samples: Dict[str, List[float]] = {}
+    _record_steps(samples)
+    spotify.SPOTIFY_URL = server.base_url
+    whatsapp.WHATSAPP_URL = server.base_url + "/whatsapp/"
+
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=True)
+        try:
+            sp = await browser.new_page()
+            for i in range(n):
+                query = _QUERIES[i % len(_QUERIES)] + f" {i}"
+                await _time(samples, "spotify.play (search)", spotify.play(sp, query))
+                await _time(samples, "spotify.play (cached)", spotify.play(sp, query))
+                if not await sp.evaluate("window.playing"):
+                    raise RuntimeError(f"spotify fixture did not start playback for {query!r}")
+
+            wa = await browser.new_page()
+            for i in range(n):
+                contact = _CONTACTS[i % len(_CONTACTS)]
+                await _time(samples, "whatsapp.send_message", whatsapp.send_message(wa, contact, f"hola {i}"))
+            sent = await wa.evaluate("window.sent.length")
+            if sent != n:
+                raise RuntimeError(f"whatsapp fixture received {sent} of {n} messages")
+        finally:
+            await browser.close()
+    return samples
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--n", type=int, default=30, help="iterations per action")
+    ap.add_argument("--api-ms", type=float, default=80.0, help="latency of the fake search XHR")
+    args = ap.parse_args()
+
+    original_dir = settings.DATA_DIR
+    server = FixtureServer(api_delay_ms=args.api_ms).start()
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            settings.DATA_DIR = data_dir
+            db.init_db()
+            try:
+                samples = asyncio.run(_bench(args.n, server))
+            finally:
+                db.close_pool()
+    finally:
+        server.stop()
+        settings.DATA_DIR = original_dir
+
+    rows = [{"stage": label, **summarize(xs)} for label, xs in samples.items()]
+    print_table(rows, ["stage", "n", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "ops_s"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Cold-start report: import time and time to the first response.
+
+Each run starts fresh interpreters, like a machine waking from auto-stop:
+
+- ``python -X importtime -c "import <package>.main"``: cumulative import time
+  of the app and of the modules that matter for startup, and whether the heavy
+  ones (Playwright, huggingface_hub, jinja2) were loaded at import at all;
+- ``uvicorn <package>.main:app`` on a free port with a throwaway ``DATA_DIR``:
+  time from spawn until ``/health`` answers, then the first ``/``.
+
+Usage::
+
+    python -m <package>.bench.coldstart [--n 5] [--dir /data]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+from .common import print_table, summarize
+
+PACKAGE = __package__.rsplit(".", 1)[0]
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Should stay out of the import of main (loaded on first use or by warm-up).
+LAZY = ["playwright.async_api", "huggingface_hub", "jinja2", "uvicorn"]
+WATCH = [f"{PACKAGE}.main", "fastapi", f"{PACKAGE}.planner", f"{PACKAGE}.orchestrator", f"{PACKAGE}.worker", *LAZY]
+
+
+def _env(data_dir: str) -> Dict[str, str]:
+    env = dict(os.environ, DATA_DIR=data_dir)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (ROOT, env.get("PYTHONPATH")) if p)
+    return env
+
+
+def _import_times(env: Dict[str, str]) -> Dict[str, float]:
+    """Cumulative import time (s) per module from ``-X importtime``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {PACKAGE}.main"],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    out: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            out[name.strip()] = int(cumulative) / 1e6
+    return out
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _poll(url: str, deadline: float) -> Optional[float]:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.01)
+    return None
+
+
+def _first_response(env: Dict[str, str], timeout_s: float) -> Dict[str, float]:
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{PACKAGE}.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        health = _poll(base + "/health", t0 + timeout_s)
+        if health is None:
+            raise RuntimeError(f"/health no respondió en {timeout_s:.0f}s")
+        t1 = time.perf_counter()
+        index = _poll(base + "/", t1 + timeout_s)
+        out = {"first /health": health - t0}
+        if index is not None:
+            out["first / (after /health)"] = index - t1
+        return out
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--n", type=int, default=5, help="fresh processes per measurement")
+    ap.add_argument("--timeout-s", type=float, default=60.0, help="give up on a server after this long")
+    ap.add_argument("--dir", default=None, help="directory for the throwaway databases")
+    args = ap.parse_args()
+
+    samples: Dict[str, List[float]] = {}
+    eager: Dict[str, int] = {}
+    for _ in range(args.n):
+        with tempfile.TemporaryDirectory(dir=args.dir) as data_dir:
+            env = _env(data_dir)
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+            samples.setdefault("python -c pass", []).append(time.perf_counter() - t0)
+            times = _import_times(env)
+            for name in WATCH:
+                if name in times:
+                    samples.setdefault(f"import {name}", []).append(times[name])
+            for name in LAZY:
+                eager[name] = eager.get(name, 0) + (name in times)
+            for label, s in _first_response(env, args.timeout_s).items():
+                samples.setdefault(label, []).append(s)
+
+    rows = [{"stage": label, **summarize(xs)} for label, xs in samples.items()]
+    print_table(rows, ["stage", "n", "mean_ms", "p50_ms", "p95_ms", "max_ms"])
+    loaded = [f"{name} ({k}/{args.n})" for name, k in eager.items() if k]
+    print("\nimportados al cargar main (deberían ser perezosos):", ", ".join(loaded) if loaded else "ninguno")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import statistics
+from typing import Dict, Iterable, List, Sequence
+
+
+def percentile(sorted_samples: Sequence[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    k = (len(sorted_samples) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_samples) - 1)
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (k - lo)
+
+
+def summarize(samples_s: Iterable[float], wall_s: float = 0.0) -> Dict[str, float]:
+    """Latency summary in milliseconds (plus throughput when ``wall_s`` is given)."""
+    xs = sorted(samples_s)
+    n = len(xs)
+    out = {
+        "n": n,
+        "mean_ms": statistics.fmean(xs) * 1000 if xs else 0.0,
+        "p50_ms": percentile(xs, 50) * 1000,
+        "p95_ms": percentile(xs, 95) * 1000,
+        "p99_ms": percentile(xs, 99) * 1000,
+        "max_ms": (xs[-1] * 1000) if xs else 0.0,
+    }
+    total = wall_s or sum(xs)
+    out["ops_s"] = (n / total) if total > 0 else 0.0
+    return out
+
+
+def print_table(rows: List[Dict[str, object]], columns: List[str]) -> None:
+    def fmt(v: object) -> str:
+        return f"{v:.3f}" if isinstance(v, float) else str(v)
+
+    cells = [[fmt(r.get(c, "")) for c in columns] for r in rows]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) if cells else len(c) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
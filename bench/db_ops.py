@@ -0,0 +1,94 @@
+"""Per-operation benchmark for db.py.
+
+Runs each public db operation against a throwaway database twice: once with
+the legacy "connect per statement" access path and default pragmas, and once
+through the pooled, tuned connection layer. Usage::
+
+    python -m <package>.bench.db_ops [--n 2000] [--dir /path/on/the/volume]
+
+Point ``--dir`` at the Fly volume to measure real fsync/open costs.
+"""
+import argparse
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, List
+
+from .. import db, settings
+from .common import print_table, summarize
+
+
+@contextmanager
+def _legacy_db() -> Iterator[sqlite3.Connection]:
+    conn = sqlite3.connect(db.db_path(), check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _ops(n: int) -> Dict[str, Callable[[int], None]]:
+    now = datetime.now(timezone.utc)
+    future = (now + timedelta(days=1)).isoformat()
+    return {
+        "kv_set": lambda i: db.kv_set(f"bench:{i % 64}", str(i)),
+        "kv_get": lambda i: db.kv_get(f"bench:{i % 64}"),
+        "add_event": lambda i: db.add_event(now.isoformat(), "bench", f"event {i}"),
+        "list_events": lambda i: db.list_events(30),
+        "add_reminder": lambda i: db.add_reminder(f"bench {i}", future),
+        "due_reminders": lambda i: db.due_reminders(now.isoformat()),
+    }
+
+
+def _run(label: str, n: int) -> List[Dict[str, object]]:
+    rows: List[Dict[str, object]] = []
+    db.init_db()
+    for name, fn in _ops(n).items():
+        samples: List[float] = []
+        for i in range(n):
+            t0 = time.perf_counter()
+            fn(i)
+            samples.append(time.perf_counter() - t0)
+        row: Dict[str, object] = {"mode": label, "op": name}
+        row.update(summarize(samples))
+        rows.append(row)
+    return rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--n", type=int, default=2000, help="iterations per operation")
+    ap.add_argument("--dir", default=None, help="directory for the throwaway databases")
+    args = ap.parse_args()
+
+    original_dir, original_db = settings.DATA_DIR, db.db
+    results: List[Dict[str, object]] = []
+    try:
+        with tempfile.TemporaryDirectory(dir=args.dir) as legacy_dir:
+            settings.DATA_DIR = legacy_dir
+            db.db = _legacy_db
+            results += _run("legacy", args.n)
+        db.db = original_db
+        with tempfile.TemporaryDirectory(dir=args.dir) as pooled_dir:
+            settings.DATA_DIR = pooled_dir
+            results += _run("pooled", args.n)
+            db.close_pool()
+    finally:
+        settings.DATA_DIR, db.db = original_dir, original_db
+
+    by_op: Dict[str, Dict[str, Dict[str, object]]] = {}
+    for r in results:
+        by_op.setdefault(str(r["op"]), {})[str(r["mode"])] = r
+    for r in results:
+        if r["mode"] == "pooled":
+            legacy = by_op[str(r["op"])]["legacy"]
+            r["speedup"] = float(legacy["mean_ms"]) / float(r["mean_ms"]) if r["mean_ms"] else 0.0
+
+    print_table(results, ["op", "mode", "n", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "ops_s", "speedup"])
+
+
+if __name__ == "__main__":
+    main()
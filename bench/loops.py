@@ -0,0 +1,129 @@
+"""Micro-benchmarks for the background machinery.
+
+- scheduler: schedule ``--n`` reminders due within ``--spread-s`` and report
+  how late each one fires (and the add_reminder cost);
+- event writer: ``add_event`` latency through the batching writer vs direct
+  synchronous inserts, plus the time to flush the queue;
+- retention: archive ``--n`` old events to gzip NDJSON.
+
+Usage::
+
+    python -m <package>.bench.loops [--n 2000] [--spread-s 2] [--dir /data]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from .. import db, settings
+from ..background import Scheduler
+from .common import print_table, summarize
+
+
+class _ProbeScheduler(Scheduler):
+    """Records how late each item fires relative to its due time."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.due: Dict[int, datetime] = {}
+        self.lag: List[float] = []
+
+    def _fire(self, kind: str, row_id: int, text: str) -> None:
+        self.lag.append((datetime.now(timezone.utc) - self.due[row_id]).total_seconds())
+        super()._fire(kind, row_id, text)
+
+
+async def _scheduler(n: int, spread_s: float) -> Dict[str, List[float]]:
+    sched = _ProbeScheduler()
+    stop = asyncio.Event()
+    task = asyncio.create_task(sched.run(stop))
+    start = datetime.now(timezone.utc) + timedelta(seconds=0.2)
+    add: List[float] = []
+    for i in range(n):
+        due = start + timedelta(seconds=spread_s * i / max(1, n))
+        t0 = time.perf_counter()
+        row_id = sched.add_reminder(f"bench {i}", due.isoformat())
+        add.append(time.perf_counter() - t0)
+        sched.due[row_id] = due
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    while len(sched.lag) < n:
+        await asyncio.sleep(0.05)
+    stop.set()
+    sched._wake.set()
+    await task
+    return {"scheduler.add_reminder": add, "scheduler fire lag": sched.lag}
+
+
+def _events(n: int) -> Dict[str, object]:
+    out: Dict[str, object] = {}
+    ts = datetime.now(timezone.utc).isoformat()
+
+    sync: List[float] = []
+    wall0 = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter()
+        db.add_event(ts, "bench", f"sync {i}")
+        sync.append(time.perf_counter() - t0)
+    out["add_event (sync)"] = (sync, time.perf_counter() - wall0)
+
+    db.event_writer.start()
+    try:
+        queued: List[float] = []
+        wall0 = time.perf_counter()
+        for i in range(n):
+            t0 = time.perf_counter()
+            db.add_event(ts, "bench", f"writer {i}")
+            queued.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        db.event_writer.flush()
+        out["event_writer.flush"] = ([time.perf_counter() - t0], 0.0)
+        # Throughput counts until the last row is committed.
+        out["add_event (writer)"] = (queued, time.perf_counter() - wall0)
+    finally:
+        db.event_writer.stop()
+    return out
+
+
+def _retention(n: int) -> Dict[str, object]:
+    old = (datetime.now(timezone.utc) - timedelta(days=settings.EVENTS_RETENTION_DAYS + 1)).isoformat()
+    db._write_events([(old, "bench.old", f"old {i}") for i in range(n)])
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=settings.EVENTS_RETENTION_DAYS)).isoformat()
+    t0 = time.perf_counter()
+    moved = db.archive_events(cutoff, keep_rows=10**9, batch=settings.EVENTS_ARCHIVE_BATCH)
+    elapsed = time.perf_counter() - t0
+    # One run: the latency columns are the whole archive pass, ops_s is rows/s.
+    row: Dict[str, object] = {"stage": "archive_events", **summarize([elapsed])}
+    row.update(n=moved, ops_s=(moved / elapsed) if elapsed > 0 else 0.0)
+    return row
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--n", type=int, default=2000, help="items per benchmark")
+    ap.add_argument("--spread-s", type=float, default=2.0, help="window the scheduled reminders fall due in")
+    ap.add_argument("--dir", default=None, help="directory for the throwaway database")
+    args = ap.parse_args()
+
+    rows: List[Dict[str, object]] = []
+    original_dir = settings.DATA_DIR
+    try:
+        with tempfile.TemporaryDirectory(dir=args.dir) as data_dir:
+            settings.DATA_DIR = data_dir
+            db.init_db()
+            for label, xs in asyncio.run(_scheduler(args.n, args.spread_s)).items():
+                rows.append({"stage": label, **summarize(xs)})
+            for label, (xs, wall) in _events(args.n).items():
+                rows.append({"stage": label, **summarize(xs, wall)})
+            rows.append(_retention(args.n))
+            db.close_pool()
+    finally:
+        settings.DATA_DIR = original_dir
+
+    print_table(rows, ["stage", "n", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "ops_s"])
+
+
+if __name__ == "__main__":
+    main()
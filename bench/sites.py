@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def track_id(query: str) -> str:
+    return hashlib.sha1(query.strip().lower().encode("utf-8")).hexdigest()[:16]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Set by FixtureServer: extra latency for the search XHR, like the real API.
+    api_delay_s = 0.0
+
+    def log_message(self, *args) -> None:  # keep benchmark output clean
+        pass
+
+    def _send(self, body: bytes, content_type: str, status: int = 200) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _file(self, *parts: str) -> None:
+        with open(os.path.join(FIXTURES, *parts), "rb") as f:
+            self._send(f.read(), "text/html; charset=utf-8")
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        path = url.path
+        if path.startswith("/whatsapp"):
+            self._file("whatsapp", "index.html")
+        elif path.startswith("/search"):
+            self._file("spotify", "search.html")
+        elif path.startswith("/track/"):
+            self._file("spotify", "track.html")
+        elif path.startswith("/pathfinder/"):
+            if self.api_delay_s:
+                time.sleep(self.api_delay_s)
+            q = parse_qs(url.query).get("q", [""])[0]
+            body = json.dumps({"id": track_id(q), "name": q}).encode("utf-8")
+            self._send(body, "application/json")
+        elif path == "/":
+            self._send(b"<!doctype html><title>fixtures</title>", "text/html")
+        else:
+            self._send(b"not found", "text/plain", status=404)
+
+
+class FixtureServer:
+    """Serves the local WhatsApp/Spotify look-alike pages on 127.0.0.1.
+
+    WhatsApp lives under ``/whatsapp/``; Spotify's ``/search/<q>``,
+    ``/track/<id>`` and the ``/pathfinder/`` search XHR live at the root.
+    """
+
+    def __init__(self, api_delay_ms: float = 0.0) -> None:
+        handler = type("Handler", (_Handler,), {"api_delay_s": api_delay_ms / 1000})
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="bench-fixtures", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -1,11 +1,32 @@
 import os
+import time
 import asyncio
 from dataclasses import dataclass
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List
 
-from playwright.async_api import async_playwright, BrowserContext, Page
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Page
 
-from . import settings
+from . import metrics, settings
+from .routing import route_policies
+
+
+SERVICE_URLS: Dict[str, str] = {
+    "whatsapp": "https://web.whatsapp.com/",
+    "spotify": "https://open.spotify.com/",
+}
+
+
+def prewarm_services() -> List[str]:
+    """Services named in ``BROWSER_PREWARM`` ("all" expands to every one)."""
+    if "all" in settings.BROWSER_PREWARM:
+        return list(SERVICE_URLS)
+    return [n for n in settings.BROWSER_PREWARM if n in SERVICE_URLS]
+
+
+def preload() -> None:
+    """Import Playwright ahead of the first launch (startup warm-up)."""
+    import playwright.async_api  # noqa: F401
 
 
 def _ensure_dir(p: str) -> None:
@@ -14,43 +35,56 @@ def _ensure_dir(p: str) -> None:
 
 @dataclass
 class ServiceSession:
-    context: BrowserContext
-    page: Page
+    context: "BrowserContext"
+    page: "Page"
 
 
 class BrowserManager:
     """Singleton-style Playwright manager.
 
     Uses **persistent** contexts in /data to keep logins across deploys.
+    Each service has its own lock, so launching WhatsApp never blocks a
+    Spotify request; contexts can be pre-warmed in the background at startup,
+    and closed again by the governor (``governor.py``) to be relaunched on
+    next use.
     """
 
     def __init__(self) -> None:
         self._pw = None
-        self._lock = asyncio.Lock()
-        self._whatsapp: Optional[ServiceSession] = None
-        self._spotify: Optional[ServiceSession] = None
+        self._pw_lock = asyncio.Lock()
+        self._locks: Dict[str, asyncio.Lock] = {name: asyncio.Lock() for name in SERVICE_URLS}
+        self._sessions: Dict[str, ServiceSession] = {}
+        self._state: Dict[str, Dict[str, Any]] = {name: {"status": "cold"} for name in SERVICE_URLS}
+        self._last_used: Dict[str, float] = {}
+        self._actions: Dict[str, int] = {}
 
     async def _startup(self) -> None:
-        if self._pw is None:
-            self._pw = await async_playwright().start()
+        async with self._pw_lock:
+            if self._pw is None:
+                from playwright.async_api import async_playwright
+
+                self._pw = await async_playwright().start()
 
     async def close(self) -> None:
-        async with self._lock:
-            if self._whatsapp:
-                await self._whatsapp.context.close()
-                self._whatsapp = None
-            if self._spotify:
-                await self._spotify.context.close()
-                self._spotify = None
+        for name, lock in self._locks.items():
+            async with lock:
+                sess = self._sessions.pop(name, None)
+                if sess:
+                    await sess.context.close()
+                self._state[name] = {"status": "cold"}
+        async with self._pw_lock:
             if self._pw:
                 await self._pw.stop()
                 self._pw = None
 
+    def user_data_dir(self, name: str) -> str:
+        return os.path.join(settings.DATA_DIR, "browser", name)
+
     async def _get_or_create(self, name: str, url: str) -> ServiceSession:
         await self._startup()
         assert self._pw is not None
 
-        root = os.path.join(settings.DATA_DIR, "browser", name)
+        root = self.user_data_dir(name)
         _ensure_dir(root)
 
         context = await self._pw.chromium.launch_persistent_context(
@@ -60,31 +94,84 @@ class BrowserManager:
                 "--no-sandbox",
                 "--disable-dev-shm-usage",
             ],
+            # Requests made by service workers bypass context.route.
+            service_workers="block" if settings.ROUTE_BLOCK else "allow",
         )
+        if settings.ROUTE_BLOCK and name in route_policies:
+            await route_policies[name].install(context)
 
         page = context.pages[0] if context.pages else await context.new_page()
         await page.goto(url, wait_until="domcontentloaded")
         return ServiceSession(context=context, page=page)
 
+    async def session(self, name: str) -> ServiceSession:
+        async with self._locks[name]:
+            sess = self._sessions.get(name)
+            if sess is None:
+                started = time.monotonic()
+                self._state[name] = {"status": "launching"}
+                try:
+                    with metrics.BROWSER_LAUNCH_SECONDS.time(service=name):
+                        sess = await self._get_or_create(name, SERVICE_URLS[name])
+                except asyncio.CancelledError:
+                    self._state[name] = {"status": "cold"}
+                    raise
+                except Exception as e:
+                    self._state[name] = {"status": "error", "error": str(e) or type(e).__name__}
+                    raise
+                self._sessions[name] = sess
+                self._actions[name] = 0
+                self._state[name] = {
+                    "status": "ready",
+                    "ready_at": time.time(),
+                    "launch_ms": round((time.monotonic() - started) * 1000, 1),
+                }
+            self._last_used[name] = time.monotonic()
+            return sess
+
+    def live(self) -> List[str]:
+        """Services with a launched context."""
+        return list(self._sessions)
+
+    def idle_s(self, name: str) -> float:
+        return time.monotonic() - self._last_used.get(name, time.monotonic())
+
+    def note_actions(self, name: str, n: int = 1) -> None:
+        if name in self._sessions:
+            self._actions[name] = self._actions.get(name, 0) + n
+
+    def actions(self, name: str) -> int:
+        return self._actions.get(name, 0)
+
+    async def recycle(self, name: str, reason: str) -> bool:
+        """Close a service's context; the next use relaunches it.
+
+        Logins survive because the profile lives in ``user_data_dir``.
+        """
+        async with self._locks[name]:
+            sess = self._sessions.pop(name, None)
+            if sess is None:
+                return False
+            try:
+                await sess.context.close()
+            finally:
+                self._actions[name] = 0
+                self._state[name] = {"status": "cold", "recycled": reason, "recycled_at": time.time()}
+            return True
+
     async def whatsapp(self) -> ServiceSession:
-        async with self._lock:
-            if self._whatsapp is None:
-                self._whatsapp = await self._get_or_create("whatsapp", "https://web.whatsapp.com/")
-            return self._whatsapp
+        return await self.session("whatsapp")
 
     async def spotify(self) -> ServiceSession:
-        async with self._lock:
-            if self._spotify is None:
-                self._spotify = await self._get_or_create("spotify", "https://open.spotify.com/")
-            return self._spotify
-
-    async def screenshot_whatsapp(self) -> bytes:
-        sess = await self.whatsapp()
-        return await sess.page.screenshot(full_page=True)
-
-    async def screenshot_spotify(self) -> bytes:
-        sess = await self.spotify()
-        return await sess.page.screenshot(full_page=True)
+        return await self.session("spotify")
+
+    async def prewarm(self, names: Iterable[str]) -> None:
+        """Launch the given services concurrently; failures are only recorded."""
+        wanted = [n for n in names if n in SERVICE_URLS]
+        await asyncio.gather(*(self.session(n) for n in wanted), return_exceptions=True)
+
+    def readiness(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(state) for name, state in self._state.items()}
 
 
 browser_manager = BrowserManager()
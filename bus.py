@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from typing import Any, Dict, Optional, Set
+
+
+class EventBus:
+    """In-process pub/sub for event rows.
+
+    ``publish`` may be called from any thread; delivery happens on the loop
+    that owns the subscribers. Slow subscribers drop their oldest events
+    instead of blocking publishers.
+    """
+
+    def __init__(self, max_queue: int = 256) -> None:
+        self.max_queue = max_queue
+        self._subs: Set["asyncio.Queue[Dict[str, Any]]"] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def subscribe(self) -> "asyncio.Queue[Dict[str, Any]]":
+        q: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subs.add(q)
+        return q
+
+    def unsubscribe(self, q: "asyncio.Queue[Dict[str, Any]]") -> None:
+        with self._lock:
+            self._subs.discard(q)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+    def _deliver(self, event: Dict[str, Any]) -> None:
+        for q in list(self._subs):
+            if q.full():
+                try:
+                    q.get_nowait()
+                    self.dropped += 1
+                except asyncio.QueueEmpty:
+                    pass
+            q.put_nowait(event)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            loop = self._loop
+            if not self._subs or loop is None or loop.is_closed():
+                return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(event)
+        else:
+            loop.call_soon_threadsafe(self._deliver, event)
+
+
+event_bus = EventBus()
@@ -0,0 +1,64 @@
+import asyncio
+import json
+from typing import Any, Dict, NamedTuple, Optional
+
+from . import settings
+
+
+class WorkerUnavailable(Exception):
+    """The automation worker did not answer on ``WORKER_SOCKET``."""
+
+
+class Reply(NamedTuple):
+    status: int
+    headers: Dict[str, str]  # lower-case names
+    body: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+async def _exchange(method: str, path: str, headers: Dict[str, str]) -> Reply:
+    reader, writer = await asyncio.open_unix_connection(settings.WORKER_SOCKET)
+    try:
+        # HTTP/1.0: no keep-alive and no chunked bodies to deal with.
+        lines = [f"{method} {path} HTTP/1.0", "Host: worker", "Content-Length: 0"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+        status_line, *header_lines = head.rstrip("\r\n").split("\r\n")
+        out: Dict[str, str] = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            out[name.strip().lower()] = value.strip()
+        if "content-length" in out:
+            body = await reader.readexactly(int(out["content-length"]))
+        else:
+            body = await reader.read()
+        return Reply(int(status_line.split(" ", 2)[1]), out, body)
+    finally:
+        writer.close()
+
+
+async def request(
+    method: str,
+    path: str,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> Reply:
+    """One request to the worker's control API over its Unix socket."""
+    timeout = settings.WORKER_TIMEOUT_S if timeout is None else timeout
+    try:
+        return await asyncio.wait_for(_exchange(method, path, headers or {}), timeout)
+    except (OSError, EOFError, ValueError, IndexError, asyncio.TimeoutError, asyncio.LimitOverrunError) as e:
+        raise WorkerUnavailable(str(e) or type(e).__name__) from e
+
+
+async def wake() -> None:
+    """Tell the worker there are new queued actions. Best effort: without it
+    the worker still finds them on its next idle poll."""
+    try:
+        await request("POST", "/wake", timeout=1.0)
+    except WorkerUnavailable:
+        pass
@@ -1,9 +1,16 @@
+import gzip
+import json
 import os
+import queue
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
-from typing import Iterator, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from . import settings
+from . import metrics, settings
+from .bus import event_bus
+from .metrics import timed
 
 
 def db_path() -> str:
@@ -11,19 +18,133 @@ def db_path() -> str:
     return os.path.join(settings.DATA_DIR, "jarvis.db")
 
 
-def connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path(), check_same_thread=False)
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        path or db_path(),
+        check_same_thread=False,
+        timeout=settings.DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=settings.DB_STATEMENT_CACHE,
+    )
     conn.row_factory = sqlite3.Row
+    # Only takes effect on a brand-new file (must precede WAL); lets event
+    # retention hand freed pages back to the filesystem.
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    sync = settings.DB_SYNCHRONOUS if settings.DB_SYNCHRONOUS in ("OFF", "NORMAL", "FULL", "EXTRA") else "NORMAL"
+    conn.execute(f"PRAGMA synchronous={sync}")
+    conn.execute(f"PRAGMA cache_size=-{int(settings.DB_CACHE_KB)}")
+    conn.execute(f"PRAGMA mmap_size={int(settings.DB_MMAP_MB) * 1024 * 1024}")
+    conn.execute(f"PRAGMA busy_timeout={int(settings.DB_BUSY_TIMEOUT_MS)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
     return conn
 
 
+class ConnectionPool:
+    """Bounded pool of long-lived connections to one database file.
+
+    At most ``size`` connections exist; callers beyond that wait for one to
+    be released. sqlite3 keeps a per-connection prepared-statement cache, so
+    reusing connections also reuses compiled statements.
+    """
+
+    def __init__(self, path: str, size: int) -> None:
+        self.path = path
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._all: list[sqlite3.Connection] = []
+
+    def acquire(self) -> sqlite3.Connection:
+        if not self._slots.acquire(timeout=settings.DB_POOL_TIMEOUT_S):
+            raise RuntimeError("Timed out waiting for a database connection")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            conn = connect(self.path)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def release(self, conn: sqlite3.Connection, broken: bool = False) -> None:
+        try:
+            if broken:
+                self._discard(conn)
+            else:
+                self._idle.put_nowait(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close(self) -> None:
+        with self._lock:
+            conns, self._all = self._all, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def pool() -> ConnectionPool:
+    global _pool
+    path = db_path()
+    with _pool_lock:
+        if _pool is None or _pool.path != path:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(path, settings.DB_POOL_SIZE)
+        return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
 @contextmanager
 def db() -> Iterator[sqlite3.Connection]:
-    conn = connect()
+    p = pool()
+    started = time.perf_counter()
+    conn = p.acquire()
+    metrics.DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+    broken = False
     try:
         yield conn
     finally:
-        conn.close()
+        # Anything left uncommitted (e.g. after an exception) is discarded
+        # before the connection goes back to the pool.
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                broken = True
+        p.release(conn, broken=broken)
 
 
 def init_db() -> None:
@@ -59,15 +180,46 @@ def init_db() -> None:
           message TEXT
         )
         """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_kind_ts ON events(kind, ts)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts)")
+        # Durable orchestrator queue. Times are epoch seconds: available_at
+        # gates retries (backoff), lease_until bounds how long a claimed row
+        # may stay "running" before another worker may take it over.
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS actions_queue (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          lane TEXT NOT NULL,
+          name TEXT NOT NULL,
+          args TEXT NOT NULL,
+          priority INTEGER NOT NULL DEFAULT 50,
+          status TEXT NOT NULL DEFAULT 'pending',
+          attempts INTEGER NOT NULL DEFAULT 0,
+          available_at REAL NOT NULL,
+          lease_until REAL,
+          created_at REAL NOT NULL,
+          updated_at REAL NOT NULL,
+          last_error TEXT
+        )
+        """)
+        # Partial indexes: only pending rows are ever looked up by time.
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders(run_at) WHERE fired=0")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_alarms_active ON alarms(run_at) WHERE active=1")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_queue_claim ON actions_queue(lane, priority, id) "
+            "WHERE status IN ('pending','running')"
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_queue_status ON actions_queue(status, updated_at)")
         conn.commit()
 
 
+@timed(metrics.DB_OP_SECONDS)
 def kv_get(key: str) -> Optional[str]:
     with db() as conn:
         row = conn.execute("SELECT value FROM kv WHERE key=?", (key,)).fetchone()
         return None if row is None else row[0]
 
 
+@timed(metrics.DB_OP_SECONDS)
 def kv_set(key: str, value: str) -> None:
     with db() as conn:
         conn.execute(
@@ -77,23 +229,278 @@ def kv_set(key: str, value: str) -> None:
         conn.commit()
 
 
-def add_event(ts_iso: str, kind: str, message: str = "") -> None:
+@timed(metrics.DB_OP_SECONDS)
+def kv_delete(key: str) -> None:
+    with db() as conn:
+        conn.execute("DELETE FROM kv WHERE key=?", (key,))
+        conn.commit()
+
+
+@timed(metrics.DB_OP_SECONDS)
+def kv_prune(prefix: str, now: float, keep: int) -> int:
+    """Delete the ``prefix`` rows whose JSON value expired (``exp`` before
+    ``now``), then all but the ``keep`` latest-expiring ones. Returns how many
+    rows went away."""
+    # Key range instead of LIKE: the prefix may contain "_" or "%".
+    bounds = (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    exp = "CASE WHEN json_valid(value) THEN json_extract(value,'$.exp') ELSE 0 END"
     with db() as conn:
-        conn.execute("INSERT INTO events(ts,kind,message) VALUES(?,?,?)", (ts_iso, kind, message))
+        n = conn.execute(f"DELETE FROM kv WHERE key>=? AND key<? AND {exp}<?", (*bounds, now)).rowcount
+        n += conn.execute(
+            f"DELETE FROM kv WHERE key>=? AND key<? AND key NOT IN "
+            f"(SELECT key FROM kv WHERE key>=? AND key<? ORDER BY {exp} DESC LIMIT ?)",
+            (*bounds, *bounds, int(keep)),
+        ).rowcount
         conn.commit()
+        return n
+
+
+@timed(metrics.DB_OP_SECONDS, op="write_events")
+def _write_events(rows: List[Tuple[str, str, str]]) -> None:
+    """Insert ``rows`` in a single transaction and publish them."""
+    written = []
+    with db() as conn:
+        for ts_iso, kind, message in rows:
+            cur = conn.execute("INSERT INTO events(ts,kind,message) VALUES(?,?,?)", (ts_iso, kind, message))
+            written.append({"id": cur.lastrowid, "ts": ts_iso, "kind": kind, "message": message})
+        conn.commit()
+    # API processes publish from background.events_tail instead, which also
+    # sees the rows written by the worker and the other API processes.
+    if settings.JARVIS_ROLE == "api":
+        return
+    for ev in written:
+        event_bus.publish(ev)
+
+
+class _Control:
+    """Flush/stop marker passed through the writer queue."""
+
+    def __init__(self, stop: bool) -> None:
+        self.stop = stop
+        self.done = threading.Event()
 
 
-def list_events(limit: int = 50):
+class EventWriter:
+    """Buffers events in memory and writes them from a dedicated thread.
+
+    A batch is committed when it reaches ``EVENT_BATCH_MAX`` rows or
+    ``EVENT_FLUSH_MS`` after its first row, whichever comes first. The queue is
+    bounded by ``EVENT_QUEUE_MAX``; when it is full ``EVENT_OVERFLOW`` decides
+    what happens: "drop_oldest" (default), "drop_new" or "block" (wait up to
+    ``EVENT_BLOCK_MS``, then drop the new event).
+    """
+
+    def __init__(self) -> None:
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, settings.EVENT_QUEUE_MAX))
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="jarvis-events", daemon=True)
+        self._thread.start()
+
+    def submit(self, row: Tuple[str, str, str]) -> None:
+        policy = settings.EVENT_OVERFLOW
+        try:
+            if policy == "block":
+                self._q.put(row, timeout=settings.EVENT_BLOCK_MS / 1000)
+            else:
+                self._q.put_nowait(row)
+            return
+        except queue.Full:
+            if policy != "drop_oldest":
+                self.dropped += 1
+                return
+        with self._q.mutex:
+            # Evict the oldest event row; control markers are never dropped.
+            for i, item in enumerate(self._q.queue):
+                if not isinstance(item, _Control):
+                    del self._q.queue[i]
+                    self.dropped += 1
+                    break
+            else:
+                self.dropped += 1
+                return
+            self._q.queue.append(row)
+            self._q.not_empty.notify()
+
+    def _control(self, stop: bool, timeout: float) -> bool:
+        marker = _Control(stop)
+        # Markers bypass the size bound so a full queue cannot lose them.
+        with self._q.mutex:
+            self._q.queue.append(marker)
+            self._q.not_empty.notify()
+        return marker.done.wait(timeout)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything submitted so far has been written."""
+        if not self.running:
+            return True
+        return self._control(False, timeout)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if not self.running:
+            return
+        self._control(True, timeout)
+        assert self._thread is not None
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        max_batch = max(1, settings.EVENT_BATCH_MAX)
+        window = settings.EVENT_FLUSH_MS / 1000
+        while True:
+            item = self._q.get()
+            batch: List[Tuple[str, str, str]] = []
+            control: Optional[_Control] = None
+            if isinstance(item, _Control):
+                control = item
+            else:
+                batch.append(item)
+                deadline = time.monotonic() + window
+                while len(batch) < max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        nxt = self._q.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if isinstance(nxt, _Control):
+                        control = nxt
+                        break
+                    batch.append(nxt)
+
+            if batch:
+                try:
+                    _write_events(batch)
+                    self.written += len(batch)
+                    self.batches += 1
+                except Exception:
+                    self.errors += 1
+
+            if control is not None:
+                control.done.set()
+                if control.stop:
+                    return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._q.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "policy": settings.EVENT_OVERFLOW,
+        }
+
+
+event_writer = EventWriter()
+
+
+def add_event(ts_iso: str, kind: str, message: str = "") -> None:
+    row = (ts_iso, kind, message)
+    if event_writer.running:
+        event_writer.submit(row)
+    else:
+        _write_events([row])
+
+
+@timed(metrics.DB_OP_SECONDS)
+def list_events(limit: int = 50, after_id: Optional[int] = None, kind: Optional[str] = None):
+    """Latest ``limit`` events, newest first.
+
+    With ``after_id`` this is a cursor read instead: events with a larger id,
+    oldest first, so the last row's id is the next cursor.
+    """
+    where, params = [], []
+    if after_id is not None:
+        where.append("id>?")
+        params.append(int(after_id))
+    if kind:
+        where.append("kind=?")
+        params.append(kind)
+    sql = "SELECT id,ts,kind,message FROM events"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id ASC LIMIT ?" if after_id is not None else " ORDER BY id DESC LIMIT ?"
+    params.append(int(limit))
     with db() as conn:
-        return conn.execute("SELECT ts,kind,message FROM events ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return conn.execute(sql, params).fetchall()
+
+
+def archive_dir() -> str:
+    path = os.path.join(settings.DATA_DIR, "archive")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@timed(metrics.DB_OP_SECONDS)
+def archive_events(older_than_iso: str, keep_rows: int, batch: int = 5000) -> int:
+    """Move old events into gzip NDJSON segments under ``archive_dir()``.
 
+    Events older than ``older_than_iso`` or beyond the newest ``keep_rows``
+    are archived, ``batch`` rows per segment. Each segment is fsync'ed and
+    renamed into place before its rows are deleted, so a crash can at worst
+    leave rows both archived and live, never lost. Returns the number moved.
+    """
+    moved = 0
+    out_dir = archive_dir()
+    while True:
+        with db() as conn:
+            max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+            rows = conn.execute(
+                "SELECT id,ts,kind,message FROM events WHERE ts<? OR id<=? ORDER BY id ASC LIMIT ?",
+                (older_than_iso, max_id - max(0, keep_rows), max(1, batch)),
+            ).fetchall()
+        if not rows:
+            break
 
-def add_reminder(text: str, run_at_iso: str) -> None:
+        first, last = rows[0]["id"], rows[-1]["id"]
+        final = os.path.join(out_dir, f"events-{first:012d}-{last:012d}.ndjson.gz")
+        tmp = final + ".tmp"
+        with open(tmp, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+                for r in rows:
+                    gz.write(json.dumps(dict(r), ensure_ascii=False).encode("utf-8") + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, final)
+
+        with db() as conn:
+            conn.executemany("DELETE FROM events WHERE id=?", [(r["id"],) for r in rows])
+            conn.commit()
+        moved += len(rows)
+        if len(rows) < batch:
+            break
+
+    if moved:
+        with db() as conn:
+            # Only reclaims space when the file uses auto_vacuum=INCREMENTAL.
+            conn.execute("PRAGMA incremental_vacuum")
+            conn.commit()
+    return moved
+
+
+@timed(metrics.DB_OP_SECONDS)
+def add_reminder(text: str, run_at_iso: str) -> int:
     with db() as conn:
-        conn.execute("INSERT INTO reminders(text,run_at,fired) VALUES(?,?,0)", (text, run_at_iso))
+        cur = conn.execute("INSERT INTO reminders(text,run_at,fired) VALUES(?,?,0)", (text, run_at_iso))
         conn.commit()
+        return int(cur.lastrowid)
 
 
+@timed(metrics.DB_OP_SECONDS)
 def due_reminders(now_iso: str):
     with db() as conn:
         return conn.execute(
@@ -102,18 +509,30 @@ def due_reminders(now_iso: str):
         ).fetchall()
 
 
-def mark_reminder_fired(reminder_id: int) -> None:
+@timed(metrics.DB_OP_SECONDS)
+def pending_reminders():
+    with db() as conn:
+        return conn.execute("SELECT id,text,run_at FROM reminders WHERE fired=0 ORDER BY run_at ASC").fetchall()
+
+
+@timed(metrics.DB_OP_SECONDS)
+def mark_reminder_fired(reminder_id: int) -> bool:
+    """Mark a reminder fired; False if it already was (e.g. by another process)."""
     with db() as conn:
-        conn.execute("UPDATE reminders SET fired=1 WHERE id=?", (reminder_id,))
+        cur = conn.execute("UPDATE reminders SET fired=1 WHERE id=? AND fired=0", (reminder_id,))
         conn.commit()
+        return cur.rowcount > 0
 
 
-def add_alarm(label: str, run_at_iso: str) -> None:
+@timed(metrics.DB_OP_SECONDS)
+def add_alarm(label: str, run_at_iso: str) -> int:
     with db() as conn:
-        conn.execute("INSERT INTO alarms(label,run_at,active) VALUES(?,?,1)", (label, run_at_iso))
+        cur = conn.execute("INSERT INTO alarms(label,run_at,active) VALUES(?,?,1)", (label, run_at_iso))
         conn.commit()
+        return int(cur.lastrowid)
 
 
+@timed(metrics.DB_OP_SECONDS)
 def due_alarms(now_iso: str):
     with db() as conn:
         return conn.execute(
@@ -122,7 +541,186 @@ def due_alarms(now_iso: str):
         ).fetchall()
 
 
-def deactivate_alarm(alarm_id: int) -> None:
+@timed(metrics.DB_OP_SECONDS)
+def active_alarms():
     with db() as conn:
-        conn.execute("UPDATE alarms SET active=0 WHERE id=?", (alarm_id,))
+        return conn.execute("SELECT id,label,run_at FROM alarms WHERE active=1 ORDER BY run_at ASC").fetchall()
+
+
+@timed(metrics.DB_OP_SECONDS)
+def deactivate_alarm(alarm_id: int) -> bool:
+    """Deactivate an alarm; False if it was not active."""
+    with db() as conn:
+        cur = conn.execute("UPDATE alarms SET active=0 WHERE id=? AND active=1", (alarm_id,))
+        conn.commit()
+        return cur.rowcount > 0
+
+
+# Durable action queue (orchestrator). Claiming is a single UPDATE ... RETURNING
+# so concurrent workers never take the same row.
+
+_CLAIMABLE = "lane=? AND ((status='pending' AND available_at<=?) OR (status='running' AND lease_until<?))"
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_add(lane: str, name: str, args_json: str, priority: int) -> int:
+    now = time.time()
+    with db() as conn:
+        cur = conn.execute(
+            "INSERT INTO actions_queue(lane,name,args,priority,status,attempts,available_at,created_at,updated_at) "
+            "VALUES(?,?,?,?,'pending',0,?,?,?)",
+            (lane, name, args_json, int(priority), now, now, now),
+        )
+        conn.commit()
+        return int(cur.lastrowid)
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_claim(lane: str, lease_s: float, name: Optional[str] = None, limit: int = 1) -> List[sqlite3.Row]:
+    """Lease up to ``limit`` runnable rows of ``lane`` (highest priority, then
+    oldest), optionally only actions called ``name``. Rows whose lease expired
+    are runnable again."""
+    now = time.time()
+    where = _CLAIMABLE + (" AND name=?" if name else "")
+    params: List[Any] = [lane, now, now] + ([name] if name else [])
+    with db() as conn:
+        rows = conn.execute(
+            f"UPDATE actions_queue SET status='running', attempts=attempts+1, lease_until=?, updated_at=? "
+            f"WHERE id IN (SELECT id FROM actions_queue WHERE {where} ORDER BY priority, id LIMIT ?) "
+            f"RETURNING id,name,args,priority,attempts,available_at",
+            [now + lease_s, now] + params + [int(limit)],
+        ).fetchall()
+        conn.commit()
+    return sorted(rows, key=lambda r: (r["priority"], r["id"]))
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_finish(action_id: int, status: str, error: Optional[str] = None) -> None:
+    """Mark a claimed row done, failed or cancelled."""
+    with db() as conn:
+        conn.execute(
+            "UPDATE actions_queue SET status=?, lease_until=NULL, last_error=?, updated_at=? WHERE id=?",
+            (status, error, time.time(), action_id),
+        )
+        conn.commit()
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_retry(action_id: int, delay_s: float, error: str, args_json: Optional[str] = None) -> None:
+    """Put a running row back to pending after ``delay_s``; ``args_json``
+    replaces its args when the failed run already did part of the work."""
+    now = time.time()
+    with db() as conn:
+        conn.execute(
+            "UPDATE actions_queue SET status='pending', lease_until=NULL, available_at=?, last_error=?, updated_at=?, "
+            "args=COALESCE(?, args) WHERE id=?",
+            (now + delay_s, error, now, args_json, action_id),
+        )
+        conn.commit()
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_pending(lane: str, name: str) -> List[sqlite3.Row]:
+    with db() as conn:
+        return conn.execute(
+            "SELECT id,args FROM actions_queue WHERE lane=? AND name=? AND status='pending' ORDER BY id",
+            (lane, name),
+        ).fetchall()
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_cancel_pending(lane: str, name: str) -> List[sqlite3.Row]:
+    """Cancel every pending ``name`` action in ``lane``; returns their args."""
+    with db() as conn:
+        rows = conn.execute(
+            "UPDATE actions_queue SET status='cancelled', updated_at=? WHERE lane=? AND name=? AND status='pending' "
+            "RETURNING id,args",
+            (time.time(), lane, name),
+        ).fetchall()
+        conn.commit()
+        return rows
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_update_args(action_id: int, args_json: str) -> bool:
+    """Replace the args of a still-pending row; False if it was claimed."""
+    with db() as conn:
+        cur = conn.execute(
+            "UPDATE actions_queue SET args=?, updated_at=? WHERE id=? AND status='pending'",
+            (args_json, time.time(), action_id),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_recover(max_attempts: int) -> Tuple[int, int]:
+    """Return running rows to pending (at startup nothing can be running:
+    whatever was claimed died with the previous process). Attempts already
+    count the interrupted run, so rows that used up ``max_attempts`` fail
+    instead: an action that takes the process down must not loop forever.
+    Returns (requeued, failed)."""
+    now = time.time()
+    with db() as conn:
+        failed = conn.execute(
+            "UPDATE actions_queue SET status='failed', lease_until=NULL, last_error='interrupted', updated_at=? "
+            "WHERE status='running' AND attempts>=?",
+            (now, int(max_attempts)),
+        ).rowcount
+        requeued = conn.execute(
+            "UPDATE actions_queue SET status='pending', lease_until=NULL, available_at=?, updated_at=? "
+            "WHERE status='running'",
+            (now, now),
+        ).rowcount
+        conn.commit()
+        return requeued, failed
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_next_due(lane: str) -> Optional[float]:
+    """Earliest time a row of ``lane`` becomes claimable (retry or lease expiry)."""
+    with db() as conn:
+        row = conn.execute(
+            "SELECT MIN(CASE status WHEN 'pending' THEN available_at ELSE lease_until END) "
+            "FROM actions_queue WHERE lane=? AND status IN ('pending','running')",
+            (lane,),
+        ).fetchone()
+        return None if row is None or row[0] is None else float(row[0])
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_counts() -> Dict[str, Dict[str, int]]:
+    """{lane: {status: count}} over the rows still kept."""
+    out: Dict[str, Dict[str, int]] = {}
+    with db() as conn:
+        for row in conn.execute("SELECT lane, status, COUNT(*) FROM actions_queue GROUP BY lane, status"):
+            out.setdefault(row[0], {})[row[1]] = int(row[2])
+    return out
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_list(status: Optional[str] = None, limit: int = 50) -> List[sqlite3.Row]:
+    sql = (
+        "SELECT id,lane,name,args,priority,status,attempts,available_at,lease_until,created_at,updated_at,last_error "
+        "FROM actions_queue"
+    )
+    params: List[Any] = []
+    if status:
+        sql += " WHERE status=?"
+        params.append(status)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(int(limit))
+    with db() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+@timed(metrics.DB_OP_SECONDS)
+def queue_prune(older_than_s: float) -> int:
+    """Delete finished rows (done, failed, cancelled) older than ``older_than_s``."""
+    with db() as conn:
+        cur = conn.execute(
+            "DELETE FROM actions_queue WHERE status IN ('done','failed','cancelled') AND updated_at<?",
+            (time.time() - older_than_s,),
+        )
         conn.commit()
+        return cur.rowcount
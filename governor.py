@@ -0,0 +1,147 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Set
+
+from . import db, settings
+from .browser import browser_manager, prewarm_services
+from .orchestrator import orchestrator, db_ts
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def browser_pids(user_data_dir: str) -> List[int]:
+    """PIDs of the Chromium launched on ``user_data_dir`` and all its
+    descendants (renderers and helpers do not always carry the flag).
+
+    Linux only: returns [] when /proc is not available.
+    """
+    if not os.path.isdir("/proc"):
+        return []
+    flag = f"--user-data-dir={user_data_dir}"
+    roots: List[int] = []
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        pid = int(entry)
+        stat = _read(f"/proc/{pid}/stat")
+        # "pid (comm) state ppid ..."; comm may contain spaces and parens.
+        rest = stat.rpartition(")")[2].split()
+        if len(rest) < 2:
+            continue
+        children.setdefault(int(rest[1]), []).append(pid)
+        if flag in _read(f"/proc/{pid}/cmdline").split("\0"):
+            roots.append(pid)
+
+    seen: List[int] = []
+    stack = list(roots)
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.append(pid)
+        stack.extend(children.get(pid, []))
+    return seen
+
+
+def rss_bytes(pids: List[int]) -> int:
+    """Sum of VmRSS over ``pids``. Shared pages are counted once per process,
+    so this overestimates, which errs on the safe side for a ceiling."""
+    total = 0
+    for pid in pids:
+        for line in _read(f"/proc/{pid}/status").splitlines():
+            if line.startswith("VmRSS:"):
+                total += int(line.split()[1]) * 1024
+                break
+    return total
+
+
+def context_rss(name: str) -> Optional[int]:
+    pids = browser_pids(browser_manager.user_data_dir(name))
+    return rss_bytes(pids) if pids else None
+
+
+class BrowserGovernor:
+    """Keeps the browser contexts from growing until the VM runs out of memory.
+
+    Every ``BROWSER_GOVERNOR_INTERVAL_S`` each launched context is closed when
+    it has been idle too long, or recycled when its processes pass the RSS
+    ceiling or it has run too many actions. Contexts are relaunched on next
+    use; a context whose lane is running an action is left alone.
+
+    Services in ``BROWSER_PREWARM`` are meant to stay warm: they are never
+    closed for being idle, and a recycled one is relaunched in the background.
+    """
+
+    def __init__(self) -> None:
+        self.rss: Dict[str, int] = {}
+        self.closed: Dict[str, int] = {"idle": 0, "memory": 0, "actions": 0}
+        self._relaunches: Set[asyncio.Task] = set()
+
+    def _reason(self, name: str, rss: Optional[int]) -> Optional[str]:
+        if (
+            settings.BROWSER_IDLE_CLOSE_S > 0
+            and name not in prewarm_services()
+            and browser_manager.idle_s(name) >= settings.BROWSER_IDLE_CLOSE_S
+        ):
+            return "idle"
+        if settings.BROWSER_RSS_MAX_MB > 0 and rss is not None and rss >= settings.BROWSER_RSS_MAX_MB * 1024 * 1024:
+            return "memory"
+        if settings.BROWSER_MAX_ACTIONS > 0 and browser_manager.actions(name) >= settings.BROWSER_MAX_ACTIONS:
+            return "actions"
+        return None
+
+    async def check(self) -> List[str]:
+        """One pass over the live contexts; returns the ones closed."""
+        closed: List[str] = []
+        for name in browser_manager.live():
+            rss = await asyncio.to_thread(context_rss, name)
+            if rss is not None:
+                self.rss[name] = rss
+            reason = self._reason(name, rss)
+            if reason is None or orchestrator.busy(name):
+                continue
+            if await browser_manager.recycle(name, reason):
+                self.closed[reason] += 1
+                self.rss.pop(name, None)
+                closed.append(name)
+                mb = f", {rss / 1048576:.0f} MB" if rss else ""
+                db.add_event(db_ts(), "browser.recycle", f"{name}: {reason}{mb}")
+                if name in prewarm_services():
+                    self._relaunch(name)
+        return closed
+
+    def _relaunch(self, name: str) -> None:
+        # Keep a reference so the task is not garbage collected mid-launch.
+        task = asyncio.create_task(browser_manager.prewarm([name]), name=f"browser-prewarm-{name}")
+        self._relaunches.add(task)
+        task.add_done_callback(self._relaunches.discard)
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        if settings.BROWSER_GOVERNOR_INTERVAL_S <= 0:
+            return
+        while not stop_event.is_set():
+            try:
+                await self.check()
+            except Exception as e:
+                db.add_event(db_ts(), "browser.recycle.err", str(e))
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=settings.BROWSER_GOVERNOR_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rss_mb": {name: round(v / 1048576, 1) for name, v in self.rss.items()},
+            "actions": {name: browser_manager.actions(name) for name in browser_manager.live()},
+            "closed": dict(self.closed),
+        }
+
+
+governor = BrowserGovernor()
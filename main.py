@@ -1,17 +1,22 @@
 import os
+import json
 import asyncio
 from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
 
 from fastapi import FastAPI, Request, HTTPException, Header
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 
-from . import settings, db
-from .planner import llm_plan
+from . import settings, db, metrics, control
+from .planner import llm_plan, llm_plan_stream, close_client, preload as preload_planner
+from .bus import event_bus
+from .plan_cache import plan_cache
 from .orchestrator import orchestrator, Action
 from .browser import browser_manager
-from .background import reminder_loop, alarm_loop
+from .screenshots import parse_options
+from .background import events_tail
+from .worker import automation_stats, screenshot_response, start_automation, stop_automation
 
 
 def _auth_or_raise(authorization: Optional[str]) -> None:
@@ -28,21 +33,59 @@ app = FastAPI(title="Jarvis Web")
 
 BASE_DIR = os.path.dirname(__file__)
 app.mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static")
-templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+_templates = None
+
+
+def _get_templates():
+    # jinja2 is only needed for "/", not to answer /health after a cold start.
+    global _templates
+    if _templates is None:
+        from fastapi.templating import Jinja2Templates
+
+        _templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+    return _templates
+
+
+def _warm_up() -> None:
+    """Load what the first requests need, off the loop, once /health answers."""
+    try:
+        _get_templates()
+        preload_planner()
+    except Exception as e:
+        # Not fatal: the same error surfaces again on first use.
+        db.add_event(db_ts(), "warmup.err", str(e))
+
 
 _stop_event = asyncio.Event()
 _bg_tasks: list[asyncio.Task] = []
 
 
+def _split() -> bool:
+    """True when Playwright and the orchestrator live in the worker process."""
+    return settings.JARVIS_ROLE == "api"
+
+
+async def _from_worker(path: str, headers: Optional[Dict[str, str]] = None) -> control.Reply:
+    try:
+        return await control.request("GET", path, headers)
+    except control.WorkerUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"El proceso de automatización no responde: {e}")
+
+
 @app.on_event("startup")
 async def _startup() -> None:
     db.init_db()
-    await orchestrator.start()
+    db.event_writer.start()
 
     _stop_event.clear()
     _bg_tasks.clear()
-    _bg_tasks.append(asyncio.create_task(reminder_loop(_stop_event), name="reminders"))
-    _bg_tasks.append(asyncio.create_task(alarm_loop(_stop_event), name="alarms"))
+    if settings.STARTUP_WARMUP:
+        _bg_tasks.append(asyncio.create_task(asyncio.to_thread(_warm_up), name="warm-up"))
+    if _split():
+        # Actions run in the worker process; this one only enqueues them.
+        _bg_tasks.append(asyncio.create_task(events_tail(_stop_event), name="events-tail"))
+    else:
+        _bg_tasks.extend(await start_automation(_stop_event))
 
 
 @app.on_event("shutdown")
@@ -50,13 +93,42 @@ async def _shutdown() -> None:
     _stop_event.set()
     for t in _bg_tasks:
         t.cancel()
-    await orchestrator.stop()
-    await browser_manager.close()
+    if not _split():
+        await stop_automation()
+    await close_client()
+    await asyncio.to_thread(db.event_writer.stop)
+    db.close_pool()
 
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return _get_templates().TemplateResponse("index.html", {"request": request})
+
+
+_SYSTEM_PROMPT = (
+    'Eres un orquestador. Devuelve SOLO JSON valido con esta forma: '
+    '{"response": string, "actions": [{"name": string, "args": object, "priority": int}], "constraints": object}. '
+    'No incluyas texto fuera del JSON.'
+)
+
+
+def _plan_messages(text: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "user", "content": text},
+    ]
+
+
+async def _enqueue_planned(a: Dict[str, Any]) -> None:
+    try:
+        name = str(a.get("name"))
+        args = a.get("args") or {}
+        prio = int(a.get("priority", 50))
+        await orchestrator.enqueue(Action(name=name, args=args, priority=prio))
+        if _split():
+            await control.wake()
+    except Exception as e:
+        db.add_event(db_ts(), "plan.action.err", str(e))
 
 
 @app.post("/api/message")
@@ -67,62 +139,242 @@ async def api_message(payload: Dict[str, Any], authorization: Optional[str] = He
     if not text:
         return JSONResponse({"response": "", "plan": {"actions": []}, "events": []})
 
-    system = (
-        'Eres un orquestador. Devuelve SOLO JSON valido con esta forma: '
-        '{"response": string, "actions": [{"name": string, "args": object, "priority": int}], "constraints": object}. '
-        'No incluyas texto fuera del JSON.'
-    )
-
-    messages: List[Dict[str, str]] = [
-        {"role": "system", "content": system},
-        {"role": "user", "content": text},
-    ]
-
-    plan = llm_plan(messages)
+    try:
+        plan = await llm_plan(_plan_messages(text))
+    except asyncio.TimeoutError:
+        db.add_event(db_ts(), "plan.err", "LLM timeout")
+        raise HTTPException(status_code=504, detail="El planificador tardó demasiado")
 
     # Enqueue actions
-    actions = plan.get("actions", []) or []
-    for a in actions:
-        try:
-            name = str(a.get("name"))
-            args = a.get("args") or {}
-            prio = int(a.get("priority", 50))
-            await orchestrator.enqueue(Action(name=name, args=args, priority=prio))
-        except Exception as e:
-            db.add_event(db_ts(), "plan.action.err", str(e))
+    for a in plan.get("actions", []) or []:
+        await _enqueue_planned(a)
 
     # Log the assistant response
     if plan.get("response"):
         db.add_event(db_ts(), "assistant", str(plan.get("response")))
 
-    events = [dict(r) for r in db.list_events(30)]
-    return JSONResponse({"response": plan.get("response", ""), "plan": plan, "events": events})
+    # Clients pass the newest event id they already have and get only deltas.
+    try:
+        after_id = int(payload["after_id"]) if payload.get("after_id") is not None else None
+    except (TypeError, ValueError):
+        after_id = None
+    if after_id is not None:
+        events = [dict(r) for r in db.list_events(30, after_id=after_id)]
+    else:
+        events = [dict(r) for r in db.list_events(30)]
+    return JSONResponse({"response": plan.get("response", ""), "planner": plan.get("source"), "plan": plan, "events": events})
+
+
+def _sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/message/stream")
+async def api_message_stream(payload: Dict[str, Any], authorization: Optional[str] = Header(default=None)):
+    """Server-Sent Events variant of /api/message.
+
+    Emits ``response`` events with text deltas, one ``action`` event per
+    action (already enqueued when sent), then ``done`` with the full plan.
+    """
+    _auth_or_raise(authorization)
+    text = str(payload.get("text", "")).strip()
+
+    async def gen():
+        if not text:
+            yield _sse("done", {"response": "", "planner": None, "plan": {"actions": []}})
+            return
+        try:
+            async for kind, data in llm_plan_stream(_plan_messages(text)):
+                if kind == "response":
+                    yield _sse("response", {"delta": data})
+                elif kind == "action":
+                    if isinstance(data, dict):
+                        await _enqueue_planned(data)
+                    yield _sse("action", data)
+                elif kind == "plan":
+                    if data.get("response"):
+                        db.add_event(db_ts(), "assistant", str(data.get("response")))
+                    yield _sse("done", {"response": data.get("response", ""), "planner": data.get("source"), "plan": data})
+        except asyncio.TimeoutError:
+            db.add_event(db_ts(), "plan.err", "LLM timeout")
+            yield _sse("error", {"detail": "El planificador tardó demasiado"})
+        except Exception as e:
+            db.add_event(db_ts(), "plan.err", str(e))
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        gen(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/api/events")
-async def api_events(limit: int = 50, authorization: Optional[str] = Header(default=None)):
+async def api_events(
+    limit: int = 50,
+    after_id: Optional[int] = None,
+    kind: Optional[str] = None,
+    authorization: Optional[str] = Header(default=None),
+):
+    """Latest events (newest first), or with ``after_id`` only the newer ones
+    (oldest first). ``cursor`` is the id to pass as ``after_id`` next time.
+    """
+    _auth_or_raise(authorization)
+    limit = max(1, min(int(limit), 1000))
+    events = [dict(r) for r in db.list_events(limit, after_id=after_id, kind=kind)]
+    cursor = max([e["id"] for e in events], default=after_id or 0)
+    return JSONResponse({"events": events, "cursor": cursor})
+
+
+@app.get("/api/queue")
+async def api_queue(
+    status: Optional[str] = None,
+    limit: int = 50,
+    authorization: Optional[str] = Header(default=None),
+):
+    """Durable action queue: counts per lane and status, plus the latest rows
+    (optionally one ``status``: pending, running, done, failed, cancelled)."""
     _auth_or_raise(authorization)
-    return JSONResponse({"events": [dict(r) for r in db.list_events(limit)]})
+    limit = max(1, min(int(limit), 500))
+    items = []
+    for r in db.queue_list(status=status, limit=limit):
+        item = dict(r)
+        item["args"] = json.loads(item["args"])
+        items.append(item)
+    return JSONResponse({"counts": db.queue_counts(), "items": items})
+
+
+@app.get("/api/events/stream")
+async def api_events_stream(
+    limit: int = 40,
+    authorization: Optional[str] = Header(default=None),
+    last_event_id: Optional[str] = Header(default=None),
+):
+    """Server-Sent Events feed of new events.
+
+    Sends the last ``limit`` events (or, on reconnect, the ones after
+    ``Last-Event-ID``) and then each new event as ``db.add_event`` writes it.
+    """
+    _auth_or_raise(authorization)
+    try:
+        last_id = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        last_id = 0
+
+    async def gen():
+        nonlocal last_id
+        q = event_bus.subscribe()
+        try:
+            if last_id:
+                backlog = [dict(r) for r in db.list_events(1000, after_id=last_id)]
+            else:
+                backlog = [dict(r) for r in reversed(db.list_events(limit))]
+            for ev in backlog:
+                last_id = ev["id"]
+                yield _sse("event", ev, ev["id"])
+            while True:
+                try:
+                    ev = await asyncio.wait_for(q.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if ev["id"] is None or ev["id"] > last_id:
+                    last_id = ev["id"] or last_id
+                    yield _sse("event", ev, ev["id"])
+        finally:
+            event_bus.unsubscribe(q)
+
+    return StreamingResponse(
+        gen(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
-@app.get("/auth/whatsapp.png")
-async def whatsapp_png(authorization: Optional[str] = Header(default=None)):
+@app.get("/api/stats")
+async def api_stats(authorization: Optional[str] = Header(default=None)):
+    _auth_or_raise(authorization)
+    return JSONResponse({
+        "plan_cache": plan_cache.stats(),
+        "event_bus": {"subscribers": event_bus.subscribers, "dropped": event_bus.dropped},
+        "event_writer": db.event_writer.stats(),
+        **((await _from_worker("/stats")).json() if _split() else automation_stats()),
+    })
+
+
+async def _screenshot(
+    service: str,
+    authorization: Optional[str],
+    if_none_match: Optional[str],
+    fmt: str,
+    quality: Optional[int],
+    full: bool,
+    clip: Optional[str],
+) -> Response:
     _auth_or_raise(authorization)
-    img = await browser_manager.screenshot_whatsapp()
-    return Response(content=img, media_type="image/png")
+    try:
+        opts = parse_options(fmt, quality, full, clip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not _split():
+        return await screenshot_response(service, opts, if_none_match)
+    query = {"fmt": fmt, "full": int(full)}
+    if quality is not None:
+        query["quality"] = quality
+    if clip:
+        query["clip"] = clip
+    forward = {"If-None-Match": if_none_match} if if_none_match else None
+    r = await _from_worker(f"/screenshot/{service}?{urlencode(query)}", forward)
+    headers = {k: r.headers[k.lower()] for k in ("ETag", "Cache-Control") if k.lower() in r.headers}
+    return Response(content=r.body, status_code=r.status, media_type=r.headers.get("content-type"), headers=headers)
+
+
+@app.get("/auth/whatsapp.png")
+async def whatsapp_png(
+    authorization: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+    fmt: str = "png",
+    quality: Optional[int] = None,
+    full: bool = True,
+    clip: Optional[str] = None,
+):
+    return await _screenshot("whatsapp", authorization, if_none_match, fmt, quality, full, clip)
 
 
 @app.get("/auth/spotify.png")
-async def spotify_png(authorization: Optional[str] = Header(default=None)):
+async def spotify_png(
+    authorization: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+    fmt: str = "png",
+    quality: Optional[int] = None,
+    full: bool = True,
+    clip: Optional[str] = None,
+):
+    return await _screenshot("spotify", authorization, if_none_match, fmt, quality, full, clip)
+
+
+@app.get("/metrics")
+async def metrics_endpoint(process: str = "api", authorization: Optional[str] = Header(default=None)):
+    # In the api role each process has its own registry: ?process=worker
+    # returns the automation worker's (actions, browsers, screenshots).
     _auth_or_raise(authorization)
-    img = await browser_manager.screenshot_spotify()
-    return Response(content=img, media_type="image/png")
+    if _split() and process == "worker":
+        return PlainTextResponse((await _from_worker("/metrics")).body, media_type="text/plain; version=0.0.4")
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/health")
 async def health():
-    # Health check endpoint
-    return {"ok": True}
+    # Health check endpoint; "browsers" tells whether the first action will
+    # pay a cold Chromium launch.
+    if not _split():
+        return {"ok": True, "browsers": browser_manager.readiness()}
+    try:
+        browsers = (await control.request("GET", "/status", timeout=2.0)).json()["browsers"]
+    except (control.WorkerUnavailable, ValueError, KeyError):
+        return {"ok": True, "worker": False, "browsers": {}}
+    return {"ok": True, "worker": True, "browsers": browsers}
 
 
 def db_ts() -> str:
@@ -0,0 +1,193 @@
+import bisect
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Seconds: from a warm SQLite read up to a slow LLM call or browser launch.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class Counter:
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in items]
+        return lines
+
+
+class Gauge:
+    """Value(s) computed at scrape time by ``fn``: a number, or a list of
+    ``(labels_dict, number)`` pairs."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Any]) -> None:
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.fn()
+        except Exception:
+            return lines
+        if isinstance(value, (int, float)):
+            return lines + [f"{self.name} {_fmt_value(value)}"]
+        return lines + [f"{self.name}{_fmt_labels(_key(labels))} {_fmt_value(v)}" for labels, v in value]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][i] += 1
+            series[1][0] += value
+
+    def time(self, **labels: Any) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(counts), total[0]) for k, (counts, total) in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', _fmt_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    """``with hist.time(op="x"):`` observes the elapsed seconds, adding
+    ``outcome="ok"|"error"``."""
+
+    def __init__(self, hist: Histogram, labels: Dict[str, Any]) -> None:
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        outcome = "ok" if exc_type is None else "error"
+        self.hist.observe(time.perf_counter() - self.started, outcome=outcome, **self.labels)
+
+
+def timed(hist: Histogram, **labels: Any) -> Callable:
+    """Decorator: observe each call's duration, labeled with ``op`` (the
+    function name) unless given."""
+
+    def wrap(fn: Callable) -> Callable:
+        op = labels.get("op", fn.__name__)
+        rest = {k: v for k, v in labels.items() if k != "op"}
+
+        @functools.wraps(fn)
+        def inner(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - started, op=op, **rest)
+
+        return inner
+
+    return wrap
+
+
+class Registry:
+    """In-process metrics in the Prometheus text format, served at ``/metrics``.
+
+    Counters and histograms are plain dicts keyed by label values behind one
+    lock per metric, so recording from the loop or from worker threads costs
+    a dict lookup and a bisect. Gauges are read from a callback at scrape time.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+
+    def _add(self, metric: Any) -> Any:
+        # Re-registering a name returns the existing metric (module reloads).
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._add(Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Any]) -> Gauge:
+        metric = Gauge(name, help, fn)
+        self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Hot-path metrics shared by several modules; module-specific gauges are
+# registered next to the state they read.
+LLM_PLAN_SECONDS = registry.histogram("jarvis_llm_plan_seconds", "Planner latency by source (rules, cache, llm) and outcome.")
+LLM_TOKENS = registry.counter("jarvis_llm_tokens_total", "Tokens reported by the LLM provider, by kind (prompt, completion).")
+ACTION_WAIT_SECONDS = registry.histogram("jarvis_action_queue_wait_seconds", "Time an action spent queued before running.")
+ACTION_RUN_SECONDS = registry.histogram("jarvis_action_run_seconds", "Time spent running an action.")
+DB_OP_SECONDS = registry.histogram("jarvis_db_op_seconds", "Latency of db.py operations.")
+DB_POOL_WAIT_SECONDS = registry.histogram("jarvis_db_pool_wait_seconds", "Time waiting for a pooled SQLite connection.")
+BROWSER_LAUNCH_SECONDS = registry.histogram("jarvis_browser_launch_seconds", "Persistent browser context launch time.")
+ACTION_STEP_SECONDS = registry.histogram("jarvis_action_step_seconds", "Duration of each browser-action step.")
+SCREENSHOT_SECONDS = registry.histogram("jarvis_screenshot_seconds", "Screenshot capture (and encode) time.")
+SCREENSHOT_REQUESTS = registry.counter("jarvis_screenshot_requests_total", "Screenshot requests by result (hit, stale, coalesced, capture).")
@@ -1,11 +1,16 @@
 import asyncio
-from dataclasses import dataclass
-from typing import Any, Dict, Callable, Awaitable, List
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Callable, Awaitable, List, Optional
 
 from .browser import browser_manager
 from .actions import spotify as spotify_actions
 from .actions import whatsapp as whatsapp_actions
-from . import db
+from . import db, metrics, settings
+from .background import scheduler
+from .textnorm import normalize
 
 
 @dataclass
@@ -13,47 +18,325 @@ class Action:
     name: str
     args: Dict[str, Any]
     priority: int = 50
+    # Set once persisted: queue row id, runs so far, and the wall-clock time
+    # it became runnable (enqueue or end of the retry backoff).
+    id: Optional[int] = field(default=None, compare=False)
+    attempts: int = field(default=0, compare=False)
+    enqueued_at: float = field(default_factory=time.time, compare=False)
+
+    @classmethod
+    def from_row(cls, row: Any) -> "Action":
+        return cls(
+            name=row["name"],
+            args=json.loads(row["args"]),
+            priority=int(row["priority"]),
+            id=int(row["id"]),
+            attempts=int(row["attempts"]),
+            enqueued_at=float(row["available_at"]),
+        )
+
+
+def _args_json(args: Dict[str, Any]) -> str:
+    return json.dumps(args or {}, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _messages(args: Dict[str, Any]) -> List[str]:
+    """whatsapp.send takes either ``message`` or (after merging) ``messages``."""
+    if isinstance(args.get("messages"), list):
+        return [str(m) for m in args["messages"]]
+    return [str(args.get("message", ""))]
+
+
+def is_transient(err: BaseException) -> bool:
+    """Errors worth retrying: timeouts and a browser closed under the action
+    (e.g. recycled by the governor)."""
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    if isinstance(err, whatsapp_actions.PartialSend):
+        err = err.error
+
+    if isinstance(err, (PlaywrightTimeoutError, asyncio.TimeoutError, TimeoutError)):
+        return True
+    return "has been closed" in str(err)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff after the ``attempts``-th failed run."""
+    return min(settings.ACTION_RETRY_MAX_S, settings.ACTION_RETRY_BASE_S * (2 ** max(0, attempts - 1)))
+
+
+# Each browser-backed service owns a single page, so its actions run one at a
+# time in their own lane; everything else shares a concurrent pool.
+BROWSER_LANES = ("whatsapp", "spotify")
+DEFAULT_LANE = "default"
+
+
+def lane_for(action_name: str) -> str:
+    service = action_name.split(".", 1)[0]
+    return service if service in BROWSER_LANES else DEFAULT_LANE
+
+
+class Lane:
+    def __init__(self, name: str, workers: int) -> None:
+        self.name = name
+        self.workers = max(1, workers)
+        # Set on enqueue so idle workers claim right away instead of waiting
+        # for the next due retry.
+        self.wake = asyncio.Event()
+        self.tasks: List[asyncio.Task] = []
+        self.busy = 0
+        self.enqueued = 0
+        self.ok = 0
+        self.failed = 0
+        self.retried = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+        self.run_total_s = 0.0
+
+    def stats(self, counts: Dict[str, int]) -> Dict[str, Any]:
+        done = self.ok + self.failed + self.retried
+        return {
+            "workers": self.workers,
+            "depth": counts.get("pending", 0),
+            "busy": self.busy,
+            "enqueued": self.enqueued,
+            "ok": self.ok,
+            "failed": self.failed,
+            "retried": self.retried,
+            "wait_avg_ms": (self.wait_total_s / done * 1000) if done else 0.0,
+            "wait_max_ms": self.wait_max_s * 1000,
+            "run_avg_ms": (self.run_total_s / done * 1000) if done else 0.0,
+        }
 
 
 class Orchestrator:
+    """Runs planned actions from the durable ``actions_queue`` table.
+
+    Enqueued actions are rows first, so they survive restarts; workers lease
+    them per lane in priority order, retry transient failures with
+    exponential backoff, and rows left running by a dead process are put
+    back at startup.
+    """
+
     def __init__(self) -> None:
-        self._q: "asyncio.PriorityQueue[tuple[int, int, Action]]" = asyncio.PriorityQueue()
-        self._seq = 0
-        self._worker_task: asyncio.Task | None = None
+        self._lanes: Dict[str, Lane] = {name: Lane(name, 1) for name in BROWSER_LANES}
+        self._lanes[DEFAULT_LANE] = Lane(DEFAULT_LANE, settings.ORCH_POOL_WORKERS)
         self._running = False
+        self._recent: Dict[str, float] = {}
+        # Queue reads and commits run off the loop on one thread: no fsync on
+        # the loop, no writer contention between lanes, and enqueues coalesce
+        # one at a time in arrival order (supersede/merge read then write).
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.coalesce_stats = {"deduped": 0, "superseded": 0, "merged": 0}
+        self.recovered = 0
+        self.interrupted = 0
 
     async def start(self) -> None:
-        if self._worker_task:
+        if self._running:
             return
         self._running = True
-        self._worker_task = asyncio.create_task(self._worker(), name="jarvis-worker")
+        self.recovered, self.interrupted = await self._db(db.queue_recover, settings.ACTION_MAX_ATTEMPTS)
+        if self.recovered:
+            db.add_event(db_ts(), "queue.recovered", f"{self.recovered} acciones reanudadas")
+        if self.interrupted:
+            db.add_event(db_ts(), "queue.interrupted", f"{self.interrupted} acciones sin más intentos")
+        for lane in self._lanes.values():
+            for i in range(lane.workers):
+                lane.tasks.append(asyncio.create_task(self._worker(lane), name=f"jarvis-{lane.name}-{i}"))
 
     async def stop(self) -> None:
         self._running = False
-        if self._worker_task:
-            self._worker_task.cancel()
-            try:
-                await self._worker_task
-            except Exception:
-                pass
-            self._worker_task = None
+        tasks = [t for lane in self._lanes.values() for t in lane.tasks]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for lane in self._lanes.values():
+            lane.tasks.clear()
+        if self._executor is not None:
+            # Let a commit in flight finish before the pool is closed.
+            await asyncio.to_thread(self._executor.shutdown, wait=True)
+            self._executor = None
+
+    async def _db(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jarvis-queue")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
 
     async def enqueue(self, action: Action) -> None:
-        # Lower number = higher priority
-        prio = int(action.priority)
-        self._seq += 1
-        await self._q.put((prio, self._seq, action))
+        lane = self._lanes[lane_for(action.name)]
+        if await self._db(self._persist, lane, action):
+            lane.enqueued += 1
+            lane.wake.set()
+
+    def _persist(self, lane: Lane, action: Action) -> bool:
+        """Coalesce ``action`` or insert its row; True if a row was added."""
+        if self._coalesce(lane, action):
+            return False
+        # Lower number = higher priority (within the action's lane)
+        action.id = db.queue_add(lane.name, action.name, _args_json(action.args), int(action.priority))
+        return True
+
+    def _coalesce(self, lane: Lane, action: Action) -> bool:
+        """Fold ``action`` into the pending rows of its lane. Returns True if
+        it was absorbed (duplicate or merged) and must not be queued itself.
+        """
+        if action.name == "spotify.play":
+            # Only the latest requested song matters. No dedup here: after
+            # "a", "b", "a" the last "a" must replace "b", and a repeated "a"
+            # just replaces the pending one.
+            for row in db.queue_cancel_pending(lane.name, "spotify.play"):
+                self.coalesce_stats["superseded"] += 1
+                query = json.loads(row["args"]).get("query", "")
+                db.add_event(db_ts(), "action.superseded", f"spotify.play: {query}")
+            return False
+
+        now = time.monotonic()
+        window = settings.COALESCE_WINDOW_S
+        if window > 0:
+            key = action.name + _args_json(action.args)
+            self._recent = {k: t for k, t in self._recent.items() if now - t < window}
+            if key in self._recent:
+                self.coalesce_stats["deduped"] += 1
+                db.add_event(db_ts(), "action.dedup", action.name)
+                return True
+            self._recent[key] = now
+
+        if action.name == "whatsapp.send":
+            contact = normalize(str((action.args or {}).get("contact", "")))
+            for row in db.queue_pending(lane.name, "whatsapp.send"):
+                args = json.loads(row["args"])
+                if normalize(str(args.get("contact", ""))) != contact:
+                    continue
+                merged = {**args, "messages": _messages(args) + _messages(action.args or {})}
+                merged.pop("message", None)
+                # A worker may have claimed the row meanwhile: then queue normally.
+                if db.queue_update_args(int(row["id"]), _args_json(merged)):
+                    self.coalesce_stats["merged"] += 1
+                    return True
+        return False
 
-    async def _worker(self) -> None:
+    def _take_batch(self, lane: Lane, action: Action) -> List[Action]:
+        """Claim the other pending WhatsApp sends so they go out in the same
+        pass as ``action`` (they are already one-per-contact after merging).
+        """
+        if action.name != "whatsapp.send":
+            return [action]
+        rows = db.queue_claim(lane.name, settings.ACTION_LEASE_S, name="whatsapp.send", limit=1000)
+        return [action] + [Action.from_row(r) for r in rows]
+
+    async def _wait_for_work(self, lane: Lane) -> None:
+        delay = settings.ORCH_IDLE_POLL_S
+        due = await self._db(db.queue_next_due, lane.name)
+        if due is not None:
+            delay = min(delay, max(0.0, due - time.time()))
+        try:
+            await asyncio.wait_for(lane.wake.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def _settle(self, lane: Lane, action: Action, err: Optional[BaseException]) -> str:
+        """Record the outcome of one run; returns "ok", "retry" or "error"."""
+        if err is None:
+            db.queue_finish(action.id, "done")
+            lane.ok += 1
+            db.add_event(db_ts(), "action.ok", f"{action.name}")
+            return "ok"
+        if is_transient(err) and action.attempts < settings.ACTION_MAX_ATTEMPTS:
+            delay = retry_delay(action.attempts)
+            args_json = None
+            if isinstance(err, whatsapp_actions.PartialSend):
+                # Resend only what did not go out; the chat already has the rest.
+                args = {k: v for k, v in action.args.items() if k != "message"}
+                args_json = _args_json({**args, "messages": _messages(action.args)[err.sent:]})
+            db.queue_retry(action.id, delay, str(err), args_json)
+            lane.retried += 1
+            db.add_event(db_ts(), "action.retry", f"{action.name} (intento {action.attempts}, en {delay:.0f}s): {err}")
+            return "retry"
+        db.queue_finish(action.id, "failed", str(err))
+        lane.failed += 1
+        db.add_event(db_ts(), "action.err", f"{action.name}: {err}")
+        return "error"
+
+    async def _worker(self, lane: Lane) -> None:
         while self._running:
-            prio, seq, action = await self._q.get()
+            lane.wake.clear()
+            try:
+                rows = await self._db(db.queue_claim, lane.name, settings.ACTION_LEASE_S)
+            except Exception as e:
+                # e.g. the database is busy: keep the worker alive and retry.
+                db.add_event(db_ts(), "queue.err", str(e))
+                await asyncio.sleep(1.0)
+                continue
+            if not rows:
+                await self._wait_for_work(lane)
+                continue
+            action = Action.from_row(rows[0])
             try:
-                await self._dispatch(action)
-                db.add_event(db_ts(), "action.ok", f"{action.name}")
+                batch = await self._db(self._take_batch, lane, action)
             except Exception as e:
-                db.add_event(db_ts(), "action.err", f"{action.name}: {e}")
+                db.add_event(db_ts(), "queue.err", str(e))
+                batch = [action]
+            started = time.time()
+            for a in batch:
+                wait = max(0.0, started - a.enqueued_at)
+                lane.wait_total_s += wait
+                lane.wait_max_s = max(lane.wait_max_s, wait)
+            lane.busy += 1
+            try:
+                if len(batch) > 1:
+                    errors = await self._dispatch_whatsapp_batch(batch)
+                else:
+                    try:
+                        await self._dispatch(action)
+                        errors = [None]
+                    except Exception as e:
+                        errors = [e]
+                elapsed = time.time() - started
+                for a, err in zip(batch, errors):
+                    try:
+                        outcome = await self._db(self._settle, lane, a, err)
+                    except Exception as e:
+                        # Keep the worker alive; the row stays running until
+                        # its lease expires and is then claimed again.
+                        db.add_event(db_ts(), "queue.err", f"{a.name}: {e}")
+                        outcome = "error"
+                    metrics.ACTION_WAIT_SECONDS.observe(max(0.0, started - a.enqueued_at), action=a.name, outcome=outcome)
+                    metrics.ACTION_RUN_SECONDS.observe(elapsed, action=a.name, outcome=outcome)
             finally:
-                self._q.task_done()
+                if lane.name in BROWSER_LANES:
+                    browser_manager.note_actions(lane.name, len(batch))
+                lane.busy -= 1
+                lane.run_total_s += time.time() - started
+
+    async def _dispatch_whatsapp_batch(self, batch: List[Action]) -> List[Any]:
+        try:
+            sess = await browser_manager.whatsapp()
+            items = [(str(a.args.get("contact", "")), _messages(a.args)) for a in batch]
+            return await whatsapp_actions.send_batch(sess.page, items)
+        except Exception as e:
+            return [e] * len(batch)
+
+    def wake(self) -> None:
+        """Make idle workers look at the queue now (rows added elsewhere)."""
+        for lane in self._lanes.values():
+            lane.wake.set()
+
+    def depths(self) -> List[tuple]:
+        counts = db.queue_counts()
+        return [({"lane": name}, counts.get(name, {}).get("pending", 0)) for name in self._lanes]
+
+    def busy(self, lane_name: str) -> bool:
+        """True while an action is running in ``lane_name``."""
+        lane = self._lanes.get(lane_name)
+        return lane is not None and lane.busy > 0
+
+    def stats(self) -> Dict[str, Any]:
+        counts = db.queue_counts()
+        out: Dict[str, Any] = {name: lane.stats(counts.get(name, {})) for name, lane in self._lanes.items()}
+        out["coalesce"] = dict(self.coalesce_stats)
+        out["recovered"] = self.recovered
+        out["interrupted"] = self.interrupted
+        return out
 
     async def _dispatch(self, action: Action) -> None:
         name = action.name
@@ -66,13 +349,19 @@ class Orchestrator:
 
         if name == "whatsapp.send":
             sess = await browser_manager.whatsapp()
-            await whatsapp_actions.send_message(sess.page, str(args.get("contact", "")), str(args.get("message", "")))
+            await whatsapp_actions.send_messages(sess.page, str(args.get("contact", "")), _messages(args))
             return
 
         if name == "reminder.add":
             text = str(args.get("text", ""))
             run_at = str(args.get("run_at", ""))
-            db.add_reminder(text=text, run_at_iso=run_at)
+            scheduler.add_reminder(text=text, run_at_iso=run_at)
+            return
+
+        if name == "alarm.add":
+            label = str(args.get("label", "")) or "alarma"
+            run_at = str(args.get("run_at", ""))
+            scheduler.add_alarm(label=label, run_at_iso=run_at)
             return
 
         raise RuntimeError(f"Acción no soportada: {name}")
@@ -84,3 +373,4 @@ def db_ts() -> str:
 
 
 orchestrator = Orchestrator()
+metrics.registry.gauge("jarvis_queue_depth", "Actions queued and not yet started, per orchestrator lane.", orchestrator.depths)
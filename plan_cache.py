@@ -0,0 +1,127 @@
+import copy
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from . import settings, db
+from .textnorm import normalize
+
+
+# Plans with these actions carry absolute times computed from "now"
+# ("en 10 minutos"), so replaying them later would be wrong.
+_UNCACHEABLE_ACTIONS = {"reminder.add", "alarm.add"}
+
+
+class PlanCache:
+    """LRU cache of planner output keyed on normalized user text.
+
+    Entries live in memory (bounded, per-entry TTL) and, optionally, in the
+    SQLite ``kv`` table so they survive restarts.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float, persist: bool) -> None:
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.persist = persist
+        self._mem: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_s > 0
+
+    def _kv_key(self, key: str) -> str:
+        return f"plan:{settings.HF_MODEL}:{key}"
+
+    def _remember(self, key: str, expires_at: float, plan: Dict[str, Any]) -> None:
+        self._mem[key] = (expires_at, plan)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def get(self, text: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        key = normalize(text)
+        now = time.time()
+
+        entry = self._mem.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            del self._mem[key]
+
+        if self.persist:
+            raw = db.kv_get(self._kv_key(key))
+            if raw:
+                try:
+                    stored = json.loads(raw)
+                    expires_at = float(stored["exp"])
+                    plan = stored["plan"]
+                except Exception:
+                    expires_at, plan = 0.0, None
+                if plan is not None and expires_at > now:
+                    self._remember(key, expires_at, plan)
+                    self.hits += 1
+                    return copy.deepcopy(plan)
+                db.kv_delete(self._kv_key(key))
+
+        self.misses += 1
+        return None
+
+    def put(self, text: str, plan: Dict[str, Any], ttl_s: Optional[float] = None) -> None:
+        if not self.enabled or not cacheable(plan):
+            return
+        key = normalize(text)
+        if not key:
+            return
+        expires_at = time.time() + (self.ttl_s if ttl_s is None else ttl_s)
+        plan = copy.deepcopy(plan)
+        self._remember(key, expires_at, plan)
+        if self.persist:
+            db.kv_set(self._kv_key(key), json.dumps({"exp": expires_at, "plan": plan}, ensure_ascii=False))
+
+    def prune(self) -> int:
+        """Drop expired persisted plans and cap them at ``max_entries`` rows
+        (lookups only delete the expired row they hit)."""
+        if not self.persist:
+            return 0
+        return db.kv_prune("plan:", time.time(), self.max_entries)
+
+    def clear(self) -> None:
+        self._mem.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._mem),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "persist": self.persist,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+
+def cacheable(plan: Dict[str, Any]) -> bool:
+    actions = plan.get("actions", []) or []
+    # Action-less plans are conversational answers ("¿qué hora es?") that
+    # may depend on the moment they were asked: always ask again.
+    if not actions:
+        return False
+    for a in actions:
+        if not isinstance(a, dict) or str(a.get("name")) in _UNCACHEABLE_ACTIONS:
+            return False
+    return True
+
+
+plan_cache = PlanCache(
+    max_entries=settings.PLAN_CACHE_SIZE,
+    ttl_s=settings.PLAN_CACHE_TTL_S,
+    persist=settings.PLAN_CACHE_PERSIST,
+)
@@ -1,10 +1,16 @@
+import asyncio
 import json
 import re
-from typing import Any, Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from huggingface_hub import InferenceClient
+from . import metrics, settings, timeparse
+from .plan_cache import plan_cache
 
-from . import settings
+if TYPE_CHECKING:  # the slowest import of the app: loaded on first use
+    from huggingface_hub import InferenceClient
 
 
 _JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
@@ -20,7 +26,209 @@ def _extract_json(text: str) -> Dict[str, Any]:
     return json.loads(m.group(0))
 
 
+_TRAILING_ESCAPE_RE = re.compile(r"(\\+)(?:u[0-9a-fA-F]{0,3})?$")
+
+
+def _trim_partial_escape(raw: str) -> str:
+    m = _TRAILING_ESCAPE_RE.search(raw)
+    if m and len(m.group(1)) % 2 == 1:
+        return raw[:m.end(1) - 1]
+    return raw
+
+
+class PlanStreamParser:
+    """Incremental parser for the planner's ``{"response", "actions"}`` JSON.
+
+    ``feed`` takes raw completion text as it arrives and returns
+    ``("response", delta)`` events for new characters of the response string
+    and ``("action", obj)`` events for each fully received action object.
+    Text before the first ``{`` is ignored.
+    """
+
+    def __init__(self) -> None:
+        self.buf = ""
+        self.response = ""
+        self.actions: List[Dict[str, Any]] = []
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._str_start = 0
+        self._key: Optional[str] = None
+        self._expect_key = False
+        self._resp_start: Optional[int] = None
+        self._in_actions = False
+        self._obj_start: Optional[int] = None
+        self._done = False
+
+    def _response_delta(self, end: int) -> str:
+        raw = _trim_partial_escape(self.buf[self._resp_start:end])
+        try:
+            text = json.loads('"' + raw + '"')
+        except ValueError:
+            return ""
+        if text and "\ud800" <= text[-1] <= "\udbff":
+            text = text[:-1]
+        delta = text[len(self.response):]
+        self.response = text
+        return delta
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        out: List[Tuple[str, Any]] = []
+        self.buf += chunk
+        buf = self.buf
+        i = self._pos
+        while i < len(buf) and not self._done:
+            c = buf[i]
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                    self._expect_key = True
+            elif self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    if self._resp_start is not None:
+                        delta = self._response_delta(i)
+                        if delta:
+                            out.append(("response", delta))
+                        self._resp_start = None
+                    elif self._depth == 1 and self._expect_key:
+                        self._key = json.loads(buf[self._str_start:i + 1])
+                        self._expect_key = False
+            elif c == '"':
+                self._in_str = True
+                self._str_start = i
+                if self._depth == 1 and not self._expect_key and self._key == "response":
+                    self._resp_start = i + 1
+            elif c in "{[":
+                self._depth += 1
+                if c == "[" and self._depth == 2 and self._key == "actions":
+                    self._in_actions = True
+                elif c == "{" and self._in_actions and self._depth == 3:
+                    self._obj_start = i
+            elif c in "}]":
+                if c == "}" and self._in_actions and self._depth == 3 and self._obj_start is not None:
+                    try:
+                        action = json.loads(buf[self._obj_start:i + 1])
+                    except ValueError:
+                        action = None
+                    if isinstance(action, dict):
+                        self.actions.append(action)
+                        out.append(("action", action))
+                    self._obj_start = None
+                elif c == "]" and self._in_actions and self._depth == 2:
+                    self._in_actions = False
+                self._depth -= 1
+                if self._depth == 0:
+                    self._done = True
+            elif c == "," and self._depth == 1:
+                self._expect_key = True
+            i += 1
+        self._pos = i
+
+        if self._in_str and self._resp_start is not None:
+            delta = self._response_delta(len(buf))
+            if delta:
+                out.append(("response", delta))
+        return out
+
+
+# Compiled intent matcher used by "rules" and "hybrid" modes. Each pattern
+# must match the whole (whitespace-collapsed) message; anything else is left
+# to the LLM in hybrid mode.
+_LEAD = r"^(?:(?:oye|jarvis|porfa|por favor)[,\s]+)*"
+_REMIND_RE = re.compile(_LEAD + r"(?:recu[eé]rdame|recordarme|av[ií]same)\s+(?:que\s+|de\s+|para\s+)?(?P<rest>.+)$", re.IGNORECASE)
+_ALARM_RE = re.compile(
+    _LEAD + r"(?:(?:pon(?:me)?|programa|crea|activa)\s+(?:una\s+|la\s+)?alarma|despi[eé]rtame)\s*(?P<rest>.*)$",
+    re.IGNORECASE,
+)
+_PLAY_RE = re.compile(_LEAD + r"(?:pon(?:me)?|reproduce|play|toca)\s+(?P<query>.+)$", re.IGNORECASE)
+_SEND_RE = re.compile(
+    _LEAD + r"(?:m[aá]nda(?:le)?|env[ií]a(?:le)?|escr[ií]bele)\s+(?:un\s+(?:mensaje|whats(?:app)?)\s+)?a\s+"
+    # The contact may be several words, so it must end at an explicit ":",
+    # "," or "que"; "manda a Juan Pérez hola" is left to the LLM.
+    r"(?P<contact>[^,:]+?)(?:\s*[,:]\s*(?:que\s+|diciendo\s+)?|\s+(?:que|diciendo)\s+)(?P<message>.+)$",
+    re.IGNORECASE,
+)
+# Messages that chain several intents or control playback are not "simple".
+_COMPOUND_RE = re.compile(r"\b(?:y\s+(?:luego|despu[eé]s|tambi[eé]n)|adem[aá]s|y\s+(?:pon|manda|env[ií]a|recu[eé]rdame))\b", re.IGNORECASE)
+_PLAY_STOPWORDS = re.compile(r"^(?:el\s+volumen|volumen|pausa|la\s+siguiente|siguiente|otra|una\s+alarma|un\s+recordatorio|un\s+temporizador)\b", re.IGNORECASE)
+
+
+def _fmt_when(when: timeparse.When) -> str:
+    return when.at.astimezone(timeparse.local_tz()).strftime("%d/%m a las %H:%M")
+
+
+def match_intent(user_text: str) -> Optional[Dict[str, Any]]:
+    """Return a plan for messages the rules understand with confidence, else None."""
+    text = re.sub(r"\s+", " ", (user_text or "").strip()).rstrip(".!")
+    if not text or _COMPOUND_RE.search(text):
+        return None
+
+    m = _ALARM_RE.match(text)
+    if m:
+        when = timeparse.parse(m.group("rest"))
+        # "a las 7" may be 7:00 or 19:00: not a confident alarm time.
+        if when is None or when.ambiguous:
+            return None
+        label = when.strip_from(m.group("rest")) or "alarma"
+        label = re.sub(r"^(?:para|a)\b\s*", "", label, flags=re.IGNORECASE) or "alarma"
+        run_at = when.utc_iso()
+        return {
+            "response": f"Alarma para el {_fmt_when(when)}.",
+            "actions": [{"name": "alarm.add", "args": {"label": label, "run_at": run_at}, "priority": 40}],
+            "constraints": {},
+        }
+
+    m = _REMIND_RE.match(text)
+    if m:
+        when = timeparse.parse(m.group("rest"))
+        if when is None:
+            return None
+        what = when.strip_from(m.group("rest"))
+        if not what:
+            return None
+        run_at = when.utc_iso()
+        return {
+            "response": f"Te recuerdo {what} el {_fmt_when(when)}.",
+            "actions": [{"name": "reminder.add", "args": {"text": what, "run_at": run_at}, "priority": 40}],
+            "constraints": {},
+        }
+
+    m = _SEND_RE.match(text)
+    if m:
+        contact, message = m.group("contact").strip(), m.group("message").strip()
+        if not contact or not message:
+            return None
+        return {
+            "response": "Mensaje en camino.",
+            "actions": [{"name": "whatsapp.send", "args": {"contact": contact, "message": message}, "priority": 60}],
+            "constraints": {},
+        }
+
+    m = _PLAY_RE.match(text)
+    if m:
+        query = m.group("query").strip()
+        if not query or _PLAY_STOPWORDS.match(query):
+            return None
+        return {
+            "response": f"Reproduciendo {query}.",
+            "actions": [{"name": "spotify.play", "args": {"query": query}, "priority": 50}],
+            "constraints": {},
+        }
+
+    return None
+
+
 def rules_plan(user_text: str) -> Dict[str, Any]:
+    plan = match_intent(user_text)
+    if plan is not None:
+        return plan
+
     t = user_text.lower()
     actions: List[Dict[str, Any]] = []
     speak = ""
@@ -55,29 +263,212 @@ def rules_plan(user_text: str) -> Dict[str, Any]:
     return {"response": speak, "actions": actions, "constraints": {}}
 
 
-def llm_plan(messages: List[Dict[str, str]]) -> Dict[str, Any]:
-    if settings.PLANNER_MODE == "rules":
-        user_text = ""
-        for m in reversed(messages):
-            if m.get("role") == "user":
-                user_text = m.get("content", "")
-                break
-        return rules_plan(user_text)
+# One long-lived client for the whole process. The sync client goes through
+# huggingface_hub's shared requests.Session, so connections are kept alive and
+# pooled between calls; it runs on a dedicated executor to stay off the loop.
+_client: Optional["InferenceClient"] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_sem = asyncio.Semaphore(settings.HF_MAX_CONCURRENCY)
+
+
+def _get_client() -> "InferenceClient":
+    global _client
+    if _client is None:
+        from huggingface_hub import InferenceClient
+
+        _client = InferenceClient(
+            provider=settings.HF_PROVIDER,
+            api_key=settings.HF_TOKEN,
+            timeout=settings.HF_TIMEOUT_S,
+        )
+    return _client
+
+
+def preload() -> None:
+    """Build the client ahead of the first LLM call (startup warm-up)."""
+    if settings.PLANNER_MODE != "rules":
+        _get_client()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.HF_MAX_CONCURRENCY, thread_name_prefix="jarvis-llm")
+    return _executor
 
-    if not settings.HF_TOKEN:
-        raise RuntimeError("HF_TOKEN is not set. Set PLANNER_MODE=rules or configure HF_TOKEN.")
 
-    client = InferenceClient(provider=settings.HF_PROVIDER, api_key=settings.HF_TOKEN)
-    resp = client.chat.completions.create(
+def _record_usage(usage: Any) -> None:
+    if usage is not None:
+        metrics.LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, kind="prompt")
+        metrics.LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, kind="completion")
+
+
+def _complete(messages: List[Dict[str, str]]) -> str:
+    resp = _get_client().chat.completions.create(
+        model=settings.HF_MODEL,
+        messages=messages,
+        max_tokens=settings.HF_MAX_TOKENS,
+        temperature=settings.HF_TEMPERATURE,
+    )
+    _record_usage(getattr(resp, "usage", None))
+    return resp.choices[0].message.content
+
+
+def _complete_stream(messages: List[Dict[str, str]], emit, cancelled: threading.Event) -> None:
+    """Run a streaming completion on the executor, passing text pieces to ``emit``."""
+    stream = _get_client().chat.completions.create(
         model=settings.HF_MODEL,
         messages=messages,
         max_tokens=settings.HF_MAX_TOKENS,
         temperature=settings.HF_TEMPERATURE,
+        stream=True,
+        # Usage comes in a final chunk (with no choices) only when asked for.
+        stream_options={"include_usage": True},
     )
-    content = resp.choices[0].message.content
-    plan = _extract_json(content)
+    for chunk in stream:
+        if cancelled.is_set():
+            break
+        _record_usage(getattr(chunk, "usage", None))
+        if not chunk.choices:
+            continue
+        piece = chunk.choices[0].delta.content
+        if piece:
+            emit(piece)
+
+
+async def close_client() -> None:
+    global _client, _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    _client = None
+
+
+def _user_text(messages: List[Dict[str, str]]) -> str:
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            return m.get("content", "")
+    return ""
+
+
+def _local_plan(user_text: str) -> Optional[Dict[str, Any]]:
+    """Answer without the provider when the mode and cache allow it."""
+    if settings.PLANNER_MODE == "rules":
+        plan = rules_plan(user_text)
+        plan["source"] = "rules"
+        return plan
+
+    if settings.PLANNER_MODE == "hybrid":
+        plan = match_intent(user_text)
+        if plan is not None:
+            plan["source"] = "rules"
+            return plan
 
+    cached = plan_cache.get(user_text)
+    if cached is not None:
+        cached["source"] = "cache"
+        return cached
+
+    if not settings.HF_TOKEN:
+        raise RuntimeError("HF_TOKEN is not set. Set PLANNER_MODE=rules or configure HF_TOKEN.")
+    return None
+
+
+def _finish_plan(user_text: str, plan: Dict[str, Any]) -> Dict[str, Any]:
     plan.setdefault("response", "")
     plan.setdefault("actions", [])
     plan.setdefault("constraints", {})
+    plan_cache.put(user_text, plan)
+    plan["source"] = "llm"
     return plan
+
+
+async def llm_plan(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Plan a reply. The returned plan's ``source`` says which path produced
+    it: "rules", "cache" or "llm".
+    """
+    started = time.perf_counter()
+    user_text = _user_text(messages)
+    plan = _local_plan(user_text)
+    if plan is not None:
+        metrics.LLM_PLAN_SECONDS.observe(time.perf_counter() - started, source=plan["source"], outcome="ok")
+        return plan
+
+    with metrics.LLM_PLAN_SECONDS.time(source="llm"):
+        loop = asyncio.get_running_loop()
+        async with _sem:
+            content = await asyncio.wait_for(
+                loop.run_in_executor(_get_executor(), _complete, messages),
+                timeout=settings.HF_TIMEOUT_S,
+            )
+        return _finish_plan(user_text, _extract_json(content))
+
+
+async def llm_plan_stream(messages: List[Dict[str, str]]) -> AsyncIterator[Tuple[str, Any]]:
+    """Streaming variant of :func:`llm_plan`.
+
+    Yields ``("response", text_delta)`` and ``("action", action)`` as soon as
+    they are parsed from the completion, then ``("plan", plan)`` once it is
+    complete. Plans that do not come from the LLM are yielded in one go.
+    """
+    started = time.perf_counter()
+    user_text = _user_text(messages)
+    plan = _local_plan(user_text)
+    if plan is not None:
+        metrics.LLM_PLAN_SECONDS.observe(time.perf_counter() - started, source=plan["source"], outcome="ok")
+        if plan.get("response"):
+            yield "response", plan["response"]
+        for a in plan.get("actions", []) or []:
+            yield "action", a
+        yield "plan", plan
+        return
+
+    loop = asyncio.get_running_loop()
+    pieces: "asyncio.Queue[Any]" = asyncio.Queue()
+    cancelled = threading.Event()
+    done = object()
+
+    def emit(piece: Any) -> None:
+        loop.call_soon_threadsafe(pieces.put_nowait, piece)
+
+    def run() -> None:
+        try:
+            _complete_stream(messages, emit, cancelled)
+        except BaseException as e:
+            emit(e)
+        finally:
+            emit(done)
+
+    # Time to the complete plan (includes the caller consuming the deltas).
+    with metrics.LLM_PLAN_SECONDS.time(source="llm"):
+        parser = PlanStreamParser()
+        deadline = loop.time() + settings.HF_TIMEOUT_S
+        async with _sem:
+            loop.run_in_executor(_get_executor(), run)
+            try:
+                while True:
+                    piece = await asyncio.wait_for(pieces.get(), timeout=max(0.0, deadline - loop.time()))
+                    if piece is done:
+                        break
+                    if isinstance(piece, BaseException):
+                        raise piece
+                    for event in parser.feed(piece):
+                        yield event
+            finally:
+                cancelled.set()
+
+        try:
+            plan = _extract_json(parser.buf)
+        except ValueError:
+            if not parser.actions and not parser.response:
+                raise
+            plan = {"response": parser.response, "actions": list(parser.actions)}
+        plan = _finish_plan(user_text, plan)
+
+    if plan.get("response") and not parser.response:
+        yield "response", str(plan["response"])
+    # Anything the incremental parser could not pick up (e.g. malformed
+    # partial JSON the final extraction still recovered) is flushed here.
+    for a in (plan.get("actions") or [])[len(parser.actions):]:
+        yield "action", a
+    yield "plan", plan
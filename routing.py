@@ -0,0 +1,98 @@
+from typing import TYPE_CHECKING, Any, Dict, List
+
+if TYPE_CHECKING:  # Playwright loads with the first browser launch
+    from playwright.async_api import BrowserContext, Route
+
+from . import settings
+
+
+# Rough transfer size per blocked request, by resource type. The body of a
+# request we never make is unknown, so "bytes saved" is an estimate.
+_EST_BYTES = {"image": 25_000, "media": 400_000, "font": 40_000, "stylesheet": 20_000, "script": 60_000}
+_EST_BYTES_OTHER = 4_000
+
+# 1x1 transparent GIF: images resolve instead of erroring, so pages do not
+# retry them or fall back to other assets.
+_PIXEL = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00"
+    b",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+)
+
+
+class RoutePolicy:
+    """What one service's browser context may load.
+
+    Requests whose resource type or URL matches the block lists are answered
+    locally (images get a pixel, tracker URLs an empty 204) or aborted; URLs
+    matching the allow list always go through, so login QR codes and Spotify
+    audio/DRM are never touched.
+    """
+
+    def __init__(self, service: str, block_types: List[str], block_urls: List[str], allow_urls: List[str]) -> None:
+        self.service = service
+        self.block_types = set(block_types)
+        self.block_urls = block_urls
+        self.allow_urls = allow_urls
+        self.seen = 0
+        self.blocked: Dict[str, int] = {}
+        self.bytes_saved_est = 0
+
+    def verdict(self, url: str, resource_type: str) -> str:
+        """'allow', 'stub' or 'abort' for one request."""
+        if any(p in url for p in self.allow_urls):
+            return "allow"
+        if any(p in url for p in self.block_urls):
+            return "stub"
+        if resource_type in self.block_types:
+            return "stub" if resource_type == "image" else "abort"
+        return "allow"
+
+    async def handle(self, route: "Route") -> None:
+        req = route.request
+        self.seen += 1
+        verdict = self.verdict(req.url, req.resource_type)
+        if verdict == "allow":
+            await route.continue_()
+            return
+        self.blocked[req.resource_type] = self.blocked.get(req.resource_type, 0) + 1
+        self.bytes_saved_est += _EST_BYTES.get(req.resource_type, _EST_BYTES_OTHER)
+        try:
+            if verdict == "abort":
+                await route.abort("blockedbyclient")
+            elif req.resource_type == "image":
+                await route.fulfill(status=200, content_type="image/gif", body=_PIXEL)
+            else:
+                await route.fulfill(status=204, body=b"")
+        except Exception:
+            # The page navigated away and the request is gone.
+            pass
+
+    async def install(self, context: "BrowserContext") -> None:
+        await context.route("**/*", self.handle)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.seen,
+            "blocked": sum(self.blocked.values()),
+            "blocked_by_type": dict(self.blocked),
+            "bytes_saved_est": self.bytes_saved_est,
+        }
+
+
+def _policy(service: str) -> RoutePolicy:
+    return RoutePolicy(
+        service,
+        settings.ROUTE_BLOCK_TYPES.get(service, []),
+        settings.ROUTE_BLOCK_URLS,
+        settings.ROUTE_ALLOW_URLS.get(service, []),
+    )
+
+
+route_policies: Dict[str, RoutePolicy] = {name: _policy(name) for name in ("whatsapp", "spotify")}
+
+
+def network_stats() -> Dict[str, Any]:
+    return {
+        "enabled": settings.ROUTE_BLOCK,
+        **{name: policy.stats() for name, policy in route_policies.items()},
+    }
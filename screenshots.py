@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import io
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from . import metrics, settings
+from .browser import browser_manager
+from .orchestrator import orchestrator
+
+
+FORMATS = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+Clip = Tuple[float, float, float, float]
+
+# Distinct option combinations kept (arbitrary clips would grow it otherwise).
+_MAX_CACHED = 16
+
+
+@dataclass(frozen=True)
+class ShotOptions:
+    fmt: str = "png"
+    quality: Optional[int] = None
+    full: bool = True
+    clip: Optional[Clip] = None
+
+    @property
+    def media_type(self) -> str:
+        return FORMATS[self.fmt]
+
+
+@dataclass
+class Shot:
+    body: bytes
+    etag: str
+    taken_at: float
+    media_type: str
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.taken_at
+
+
+def parse_options(fmt: str = "png", quality: Optional[int] = None, full: bool = True, clip: Optional[str] = None) -> ShotOptions:
+    """Validate query-string options; raises ValueError with a user message."""
+    fmt = (fmt or "png").lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in FORMATS:
+        raise ValueError("Formato no soportado (png, jpeg o webp)")
+    if quality is not None:
+        if fmt == "png":
+            raise ValueError("quality solo aplica a jpeg y webp")
+        if not 1 <= quality <= 100:
+            raise ValueError("quality debe estar entre 1 y 100")
+    box: Optional[Clip] = None
+    if clip:
+        try:
+            x, y, w, h = (float(v) for v in clip.split(","))
+        except ValueError:
+            raise ValueError("clip debe ser x,y,ancho,alto")
+        if w <= 0 or h <= 0:
+            raise ValueError("clip debe tener ancho y alto positivos")
+        box = (x, y, w, h)
+    if fmt == "webp":
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            raise ValueError("webp requiere Pillow instalado")
+    return ShotOptions(fmt=fmt, quality=quality, full=full and box is None, clip=box)
+
+
+def _to_webp(png: bytes, quality: Optional[int]) -> bytes:
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.open(io.BytesIO(png)).save(out, format="WEBP", quality=quality or 80)
+    return out.getvalue()
+
+
+class ScreenshotCache:
+    """Short-lived screenshots per service and options.
+
+    Concurrent requests for the same image share one capture (single
+    flight), and while the service's lane is running an action a recent
+    stale image is served instead of touching the page it is driving.
+    """
+
+    def __init__(self) -> None:
+        self._shots: Dict[Tuple[str, ShotOptions], Shot] = {}
+        self._inflight: Dict[Tuple[str, ShotOptions], "asyncio.Future[Shot]"] = {}
+        self.hits = 0
+        self.stale_served = 0
+        self.coalesced = 0
+        self.captures = 0
+        self.capture_ms_total = 0.0
+
+    async def _capture(self, service: str, opts: ShotOptions) -> Shot:
+        sess = await browser_manager.session(service)
+        kwargs: Dict[str, Any] = {"full_page": opts.full}
+        if opts.clip:
+            x, y, w, h = opts.clip
+            kwargs["clip"] = {"x": x, "y": y, "width": w, "height": h}
+        started = time.perf_counter()
+        if opts.fmt == "jpeg":
+            body = await sess.page.screenshot(type="jpeg", quality=opts.quality or 80, **kwargs)
+        else:
+            body = await sess.page.screenshot(type="png", **kwargs)
+            if opts.fmt == "webp":
+                body = await asyncio.to_thread(_to_webp, body, opts.quality)
+        elapsed = time.perf_counter() - started
+        self.captures += 1
+        self.capture_ms_total += elapsed * 1000
+        metrics.SCREENSHOT_SECONDS.observe(elapsed, service=service, fmt=opts.fmt)
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        return Shot(body=body, etag=etag, taken_at=time.monotonic(), media_type=opts.media_type)
+
+    async def get(self, service: str, opts: ShotOptions) -> Shot:
+        key = (service, opts)
+        shot = self._shots.get(key)
+        if shot is not None:
+            if shot.age < settings.SCREENSHOT_TTL_S:
+                self.hits += 1
+                metrics.SCREENSHOT_REQUESTS.inc(service=service, result="hit")
+                return shot
+            if shot.age < settings.SCREENSHOT_STALE_S and orchestrator.busy(service):
+                self.stale_served += 1
+                metrics.SCREENSHOT_REQUESTS.inc(service=service, result="stale")
+                return shot
+
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+            metrics.SCREENSHOT_REQUESTS.inc(service=service, result="coalesced")
+            return await asyncio.shield(fut)
+
+        metrics.SCREENSHOT_REQUESTS.inc(service=service, result="capture")
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            shot = await self._capture(service, opts)
+            self._shots[key] = shot
+            if len(self._shots) > _MAX_CACHED:
+                oldest = min(self._shots, key=lambda k: self._shots[k].taken_at)
+                del self._shots[oldest]
+            fut.set_result(shot)
+            return shot
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            # Retrieved here so a capture nobody else waited on does not log.
+            fut.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": len(self._shots),
+            "hits": self.hits,
+            "stale_served": self.stale_served,
+            "coalesced": self.coalesced,
+            "captures": self.captures,
+            "capture_avg_ms": round(self.capture_ms_total / self.captures, 1) if self.captures else 0.0,
+        }
+
+
+screenshot_cache = ScreenshotCache()
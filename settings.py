@@ -6,27 +6,154 @@ def env(name: str, default: str = "") -> str:
     return default if v is None else v
 
 
+def env_list(name: str, default: str = "") -> list[str]:
+    """Comma-separated setting as a list of trimmed, non-empty items."""
+    return [item.strip() for item in env(name, default).split(",") if item.strip()]
+
+
 # Fly sets PORT; default 8080 for fly.toml internal_port.
 PORT: int = int(env("PORT", "8080"))
 
 # Persistent data root (Fly Volume mounted here)
 DATA_DIR: str = env("DATA_DIR", "/data")
 
+# Process layout: "all" runs the API and the automation (Playwright,
+# orchestrator, scheduler) in one process; "api" only plans and enqueues, and
+# forwards screenshots and browser status to the automation worker
+# (python -m app.worker) over WORKER_SOCKET, so uvicorn can use --workers N.
+# The control API has no auth of its own: the socket is created 0600, and
+# lives in DATA_DIR rather than a world-writable /tmp.
+JARVIS_ROLE: str = env("JARVIS_ROLE", "all").strip().lower()  # all|api
+WORKER_SOCKET: str = env("WORKER_SOCKET", os.path.join(DATA_DIR, "worker.sock"))
+WORKER_TIMEOUT_S: float = float(env("WORKER_TIMEOUT_S", "30"))
+# api role: how often the events table is polled to feed /api/events/stream
+EVENTS_TAIL_MS: int = int(env("EVENTS_TAIL_MS", "250"))
+
+# Import the LLM client and Playwright in a background thread right after
+# startup instead of at module load, so /health answers first after a cold
+# start and the first request still finds them loaded
+STARTUP_WARMUP: bool = env("STARTUP_WARMUP", "1").strip() not in ("0", "false", "False")
+
+# SQLite connection pool and pragmas (db.py)
+DB_POOL_SIZE: int = int(env("DB_POOL_SIZE", "4"))
+DB_POOL_TIMEOUT_S: float = float(env("DB_POOL_TIMEOUT_S", "10"))
+DB_BUSY_TIMEOUT_MS: int = int(env("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_SYNCHRONOUS: str = env("DB_SYNCHRONOUS", "NORMAL").strip().upper()
+DB_CACHE_KB: int = int(env("DB_CACHE_KB", "8192"))
+DB_MMAP_MB: int = int(env("DB_MMAP_MB", "64"))
+DB_STATEMENT_CACHE: int = int(env("DB_STATEMENT_CACHE", "128"))
+
+# Event log writer: events are buffered and committed in batches off the loop
+EVENT_QUEUE_MAX: int = int(env("EVENT_QUEUE_MAX", "10000"))
+EVENT_BATCH_MAX: int = int(env("EVENT_BATCH_MAX", "200"))
+EVENT_FLUSH_MS: int = int(env("EVENT_FLUSH_MS", "100"))
+EVENT_OVERFLOW: str = env("EVENT_OVERFLOW", "drop_oldest").strip().lower()  # drop_oldest|drop_new|block
+EVENT_BLOCK_MS: int = int(env("EVENT_BLOCK_MS", "50"))
+
+# Event retention: older events move to gzip NDJSON files in DATA_DIR/archive
+EVENTS_RETENTION_DAYS: float = float(env("EVENTS_RETENTION_DAYS", "14"))
+EVENTS_KEEP_ROWS: int = int(env("EVENTS_KEEP_ROWS", "20000"))
+EVENTS_ARCHIVE_BATCH: int = int(env("EVENTS_ARCHIVE_BATCH", "5000"))
+EVENTS_RETENTION_INTERVAL_S: float = float(env("EVENTS_RETENTION_INTERVAL_S", "3600"))  # 0 disables
+
+# Reminder/alarm scheduler: longest single sleep (re-checks the in-memory heap)
+SCHEDULER_MAX_SLEEP_S: float = float(env("SCHEDULER_MAX_SLEEP_S", "300"))
+
 # Optional bearer token for API endpoints (recommended)
 API_BEARER_TOKEN: str = env("API_BEARER_TOKEN", "").strip()
 
-# Planner mode: "llm" (default) or "rules"
+# Planner mode: "llm" (default), "rules" or "hybrid" (rules first, LLM on a miss)
 PLANNER_MODE: str = env("PLANNER_MODE", "llm").strip().lower()
 
+# Time zone used to interpret "a las 8", "mañana", ... in user messages
+LOCAL_TZ: str = env("LOCAL_TZ", "UTC").strip() or "UTC"
+
 # HuggingFace Hub InferenceClient (provider-backed) config
 HF_TOKEN: str = env("HF_TOKEN", "").strip()
 HF_PROVIDER: str = env("HF_PROVIDER", "fireworks-ai").strip()  # e.g. "fireworks-ai"
 HF_MODEL: str = env("HF_MODEL", "openai/gpt-oss-120b").strip()
 HF_MAX_TOKENS: int = int(env("HF_MAX_TOKENS", "900"))
 HF_TEMPERATURE: float = float(env("HF_TEMPERATURE", "0.2"))
+# Max LLM calls in flight at once and per-call timeout (seconds)
+HF_MAX_CONCURRENCY: int = max(1, int(env("HF_MAX_CONCURRENCY", "8")))
+HF_TIMEOUT_S: float = float(env("HF_TIMEOUT_S", "30"))
+
+# Plan cache: in-memory LRU keyed on normalized user text, optionally
+# persisted in the SQLite kv table (expired rows and rows beyond
+# PLAN_CACHE_SIZE are pruned by the retention loop)
+PLAN_CACHE_SIZE: int = int(env("PLAN_CACHE_SIZE", "512"))
+PLAN_CACHE_TTL_S: float = float(env("PLAN_CACHE_TTL_S", "86400"))
+PLAN_CACHE_PERSIST: bool = env("PLAN_CACHE_PERSIST", "1").strip() not in ("0", "false", "False")
+
+# Orchestrator: concurrent workers for non-browser actions (reminders, alarms)
+ORCH_POOL_WORKERS: int = int(env("ORCH_POOL_WORKERS", "4"))
+# Identical actions (same name and args) within this window run once; 0 disables
+COALESCE_WINDOW_S: float = float(env("COALESCE_WINDOW_S", "3"))
+# Durable action queue (SQLite): how long a claimed action may run before
+# another worker may take it over, retries of transient failures (timeouts)
+# with exponential backoff, idle re-check interval, and how long finished
+# rows are kept for /api/queue
+ACTION_LEASE_S: float = float(env("ACTION_LEASE_S", "300"))
+ACTION_MAX_ATTEMPTS: int = int(env("ACTION_MAX_ATTEMPTS", "3"))
+ACTION_RETRY_BASE_S: float = float(env("ACTION_RETRY_BASE_S", "5"))
+ACTION_RETRY_MAX_S: float = float(env("ACTION_RETRY_MAX_S", "300"))
+ORCH_IDLE_POLL_S: float = float(env("ORCH_IDLE_POLL_S", "30"))
+QUEUE_KEEP_S: float = float(env("QUEUE_KEEP_S", "86400"))
+
+# WhatsApp contact index (kv): how often to re-read the chat list, and the
+# minimum fuzzy score (0-1) to trust a local name match
+CONTACT_INDEX_REFRESH_S: float = float(env("CONTACT_INDEX_REFRESH_S", "300"))
+CONTACT_MATCH_MIN: float = float(env("CONTACT_MATCH_MIN", "0.6"))
+
+# Selector resolution in the action modules: time given to the last winning
+# selector before racing all candidates, and how long a more specific
+# candidate may lag behind the first match and still win
+SELECTOR_FAST_MS: int = int(env("SELECTOR_FAST_MS", "750"))
+SELECTOR_GRACE_MS: int = int(env("SELECTOR_GRACE_MS", "100"))
+
+# Readiness waits in the action modules (instead of fixed sleeps): upper bound
+# for a condition, and how long a results list must stay unchanged to count
+# as settled
+WAIT_TIMEOUT_MS: int = int(env("WAIT_TIMEOUT_MS", "5000"))
+WAIT_SETTLE_MS: int = int(env("WAIT_SETTLE_MS", "150"))
 
 # Playwright
 PW_HEADLESS: bool = env("PW_HEADLESS", "1").strip() not in ("0", "false", "False")
+# Services whose browser context is launched in the background at startup
+# (comma separated: whatsapp,spotify; "all" for both). Empty = lazy.
+BROWSER_PREWARM: list[str] = [s.lower() for s in env_list("BROWSER_PREWARM")]
+
+# Browser governor (governor.py): close a context after this long unused,
+# recycle it past an RSS ceiling (all its Chromium processes) or after this
+# many actions; 0 disables each rule. Contexts relaunch on next use, except
+# BROWSER_PREWARM ones: never closed when idle, relaunched right after a recycle.
+BROWSER_IDLE_CLOSE_S: float = float(env("BROWSER_IDLE_CLOSE_S", "1800"))
+BROWSER_RSS_MAX_MB: int = int(env("BROWSER_RSS_MAX_MB", "700"))
+BROWSER_MAX_ACTIONS: int = int(env("BROWSER_MAX_ACTIONS", "300"))
+BROWSER_GOVERNOR_INTERVAL_S: float = float(env("BROWSER_GOVERNOR_INTERVAL_S", "30"))
+
+# Network policy for the automation contexts (routing.py): resource types and
+# URL substrings answered locally instead of downloaded, and URL substrings
+# that are always let through (login QR, Spotify audio and DRM)
+ROUTE_BLOCK: bool = env("ROUTE_BLOCK", "1").strip() not in ("0", "false", "False")
+ROUTE_BLOCK_TYPES: dict[str, list[str]] = {
+    "whatsapp": env_list("ROUTE_BLOCK_TYPES_WHATSAPP", "image,media,font"),
+    "spotify": env_list("ROUTE_BLOCK_TYPES_SPOTIFY", "image,font"),
+}
+ROUTE_BLOCK_URLS: list[str] = env_list(
+    "ROUTE_BLOCK_URLS",
+    "google-analytics.com,googletagmanager.com,doubleclick.net,facebook.net/tr,"
+    "sentry.io,hotjar.com,branch.io,gabo-receiver-service,/v1/events",
+)
+ROUTE_ALLOW_URLS: dict[str, list[str]] = {
+    "whatsapp": env_list("ROUTE_ALLOW_URLS_WHATSAPP", "qr"),
+    "spotify": env_list("ROUTE_ALLOW_URLS_SPOTIFY", "audio,widevine,license,/cdm/"),
+}
+
+# Screenshot endpoints (/auth/*.png): how long a capture is reused, and how
+# old a capture may be served while that service is running an action
+SCREENSHOT_TTL_S: float = float(env("SCREENSHOT_TTL_S", "2"))
+SCREENSHOT_STALE_S: float = float(env("SCREENSHOT_STALE_S", "30"))
 
 # OpenWeather (optional for wakeup)
 OPENWEATHER_API_KEY: str = env("OPENWEATHER_API_KEY", "").strip()
@@ -9,9 +9,14 @@ function addMsg(who, msg) {
   div.textContent = msg;
   chat.appendChild(div);
   chat.scrollTop = chat.scrollHeight;
+  return div;
 }
 
+const MAX_EVENTS = 40;
+let shownEvents = [];
+
 function renderEvents(events) {
+  shownEvents = events.slice(0, MAX_EVENTS);
   eventsBox.innerHTML = "";
   for (const ev of events) {
     const div = document.createElement("div");
@@ -21,41 +26,142 @@ function renderEvents(events) {
   }
 }
 
+// Adds events not shown yet (any order) and re-renders newest first.
+function mergeEvents(events) {
+  const known = new Set(shownEvents.map((x) => x.id));
+  const fresh = events.filter((x) => !known.has(x.id));
+  if (!fresh.length) return;
+  renderEvents([...fresh, ...shownEvents].sort((a, b) => b.id - a.id));
+}
+
 async function refreshEvents() {
   try {
-    const r = await fetch("/api/events?limit=40");
+    let url = "/api/events?limit=" + MAX_EVENTS;
+    if (shownEvents.length) url += "&after_id=" + shownEvents[0].id;
+    const r = await fetch(url);
     const data = await r.json();
-    renderEvents(data.events || []);
+    mergeEvents(data.events || []);
   } catch (e) {
     // ignore
   }
 }
 
-form.addEventListener("submit", async (e) => {
-  e.preventDefault();
-  const v = text.value.trim();
-  if (!v) return;
-  addMsg("user", v);
-  text.value = "";
+// Live events come from the SSE feed; polling only runs while it is down.
+let pollTimer = null;
+
+function startPolling() {
+  if (pollTimer) return;
+  refreshEvents();
+  pollTimer = setInterval(refreshEvents, 3000);
+}
+
+function stopPolling() {
+  if (!pollTimer) return;
+  clearInterval(pollTimer);
+  pollTimer = null;
+}
+
+function connectEvents() {
+  if (!window.EventSource) {
+    startPolling();
+    return;
+  }
+  const es = new EventSource("/api/events/stream?limit=" + MAX_EVENTS);
+  es.onopen = () => stopPolling();
+  es.addEventListener("event", (e) => {
+    mergeEvents([JSON.parse(e.data)]);
+  });
+  es.onerror = () => {
+    // EventSource retries by itself; keep the panel fresh meanwhile.
+    startPolling();
+  };
+}
+
+async function sendPlain(v) {
+  const r = await fetch("/api/message", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ text: v, after_id: shownEvents.length ? shownEvents[0].id : undefined }),
+  });
+
+  const data = await r.json();
+  if (data.response) {
+    addMsg("assistant", data.response);
+  } else {
+    addMsg("assistant", "(ok)");
+  }
+  if (data.events && pollTimer) mergeEvents(data.events);
+}
 
+// Streams the plan over SSE: response text is shown as it arrives and
+// actions are already running server-side by the time they are announced.
+// Returns false if streaming is unavailable so the caller can fall back.
+async function sendStreaming(v) {
+  let r;
   try {
-    const r = await fetch("/api/message", {
+    r = await fetch("/api/message/stream", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ text: v }),
     });
+  } catch (e) {
+    return false;
+  }
+  if (!r.ok || !r.body || !r.body.getReader) return false;
 
-    const data = await r.json();
-    if (data.response) {
-      addMsg("assistant", data.response);
-    } else {
-      addMsg("assistant", "(ok)");
+  const bubble = addMsg("assistant", "");
+  const reader = r.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = "";
+  let gotText = false;
+
+  const handle = (frame) => {
+    let ev = "message";
+    let data = "";
+    for (const line of frame.split("\n")) {
+      if (line.startsWith("event:")) ev = line.slice(6).trim();
+      else if (line.startsWith("data:")) data += line.slice(5).trim();
     }
-    if (data.events) renderEvents(data.events);
+    if (!data) return;
+    const obj = JSON.parse(data);
+    if (ev === "response") {
+      bubble.textContent += obj.delta || "";
+      gotText = gotText || !!obj.delta;
+      chat.scrollTop = chat.scrollHeight;
+    } else if (ev === "done") {
+      if (!gotText) bubble.textContent = obj.response || "(ok)";
+    } else if (ev === "error") {
+      bubble.textContent = "Error: " + (obj.detail || "desconocido");
+      gotText = true;
+    }
+  };
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    let idx;
+    while ((idx = buf.indexOf("\n\n")) >= 0) {
+      handle(buf.slice(0, idx));
+      buf = buf.slice(idx + 2);
+    }
+  }
+  if (!bubble.textContent) bubble.textContent = "(ok)";
+  return true;
+}
+
+form.addEventListener("submit", async (e) => {
+  e.preventDefault();
+  const v = text.value.trim();
+  if (!v) return;
+  addMsg("user", v);
+  text.value = "";
+
+  try {
+    if (!(await sendStreaming(v))) await sendPlain(v);
   } catch (err) {
     addMsg("assistant", "Error enviando mensaje: " + err);
   }
 });
 
-setInterval(refreshEvents, 3000);
-refreshEvents();
+connectEvents();
@@ -0,0 +1,12 @@
+import pytest
+
+from .. import db, settings
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """A fresh database under a temporary DATA_DIR."""
+    monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+    db.init_db()
+    yield tmp_path
+    db.close_pool()
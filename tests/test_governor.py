@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+import pytest
+
+from .. import governor, settings
+from ..browser import browser_manager
+from ..governor import BrowserGovernor
+
+
+@pytest.fixture
+def idle_browsers(monkeypatch, data_dir):
+    monkeypatch.setattr(settings, "BROWSER_PREWARM", ["whatsapp"])
+    monkeypatch.setattr(settings, "BROWSER_IDLE_CLOSE_S", 1800)
+    monkeypatch.setattr(browser_manager, "_last_used", {n: time.monotonic() - 3600 for n in ("whatsapp", "spotify")})
+    monkeypatch.setattr(browser_manager, "live", lambda: ["whatsapp", "spotify"])
+    monkeypatch.setattr(governor, "context_rss", lambda name: None)
+    recycled, launched = [], []
+
+    async def recycle(name, reason):
+        recycled.append((name, reason))
+        return True
+
+    async def prewarm(names):
+        launched.extend(names)
+
+    monkeypatch.setattr(browser_manager, "recycle", recycle)
+    monkeypatch.setattr(browser_manager, "prewarm", prewarm)
+    return recycled, launched
+
+
+def test_prewarmed_service_is_not_closed_when_idle(idle_browsers):
+    recycled, launched = idle_browsers
+    assert asyncio.run(BrowserGovernor().check()) == ["spotify"]
+    assert recycled == [("spotify", "idle")]
+    assert launched == []
+
+
+def test_recycled_prewarmed_service_is_relaunched(idle_browsers, monkeypatch):
+    recycled, launched = idle_browsers
+    monkeypatch.setattr(settings, "BROWSER_IDLE_CLOSE_S", 0)
+    monkeypatch.setattr(settings, "BROWSER_MAX_ACTIONS", 10)
+    monkeypatch.setattr(browser_manager, "_actions", {"whatsapp": 10, "spotify": 10})
+
+    async def run():
+        closed = await BrowserGovernor().check()
+        await asyncio.sleep(0)
+        return closed
+
+    assert asyncio.run(run()) == ["whatsapp", "spotify"]
+    assert launched == ["whatsapp"]
@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+from .. import db
+from ..actions.whatsapp import PartialSend
+from ..orchestrator import Action, Orchestrator
+
+
+def _pending(name):
+    return [json.loads(r["args"]) for r in reversed(db.queue_list(status="pending")) if r["name"] == name]
+
+
+def test_play_again_after_superseded_play_is_queued(data_dir):
+    orch = Orchestrator()
+
+    async def run():
+        for query in ("a", "b", "a"):
+            await orch.enqueue(Action(name="spotify.play", args={"query": query}))
+
+    asyncio.run(run())
+    assert _pending("spotify.play") == [{"query": "a"}]
+    assert orch.coalesce_stats["superseded"] == 2
+    assert orch.coalesce_stats["deduped"] == 0
+
+
+def test_repeated_reminder_within_window_is_deduped(data_dir):
+    orch = Orchestrator()
+    action = {"text": "x", "run_at": "2030-01-01T00:00:00+00:00"}
+
+    async def run():
+        for _ in range(2):
+            await orch.enqueue(Action(name="reminder.add", args=dict(action)))
+
+    asyncio.run(run())
+    assert _pending("reminder.add") == [action]
+    assert orch.coalesce_stats["deduped"] == 1
+
+
+def test_recover_fails_rows_out_of_attempts(data_dir):
+    fresh = db.queue_add("default", "reminder.add", "{}", 50)
+    spent = db.queue_add("default", "reminder.add", "{}", 50)
+    # Both were running when the process died; one already used its attempts.
+    with db.db() as conn:
+        conn.execute("UPDATE actions_queue SET status='running', attempts=? WHERE id=?", (1, fresh))
+        conn.execute("UPDATE actions_queue SET status='running', attempts=? WHERE id=?", (3, spent))
+        conn.commit()
+
+    assert db.queue_recover(3) == (1, 1)
+    status = {r["id"]: (r["status"], r["last_error"]) for r in db.queue_list()}
+    assert status[fresh] == ("pending", None)
+    assert status[spent] == ("failed", "interrupted")
+
+
+def test_retry_after_partial_send_resends_only_the_rest(data_dir):
+    orch = Orchestrator()
+    args = {"contact": "Ana", "messages": ["uno", "dos", "tres"]}
+    db.queue_add("whatsapp", "whatsapp.send", json.dumps(args), 60)
+    action = Action.from_row(db.queue_claim("whatsapp", 60)[0])
+
+    err = PartialSend(1, asyncio.TimeoutError())
+    assert orch._settle(orch._lanes["whatsapp"], action, err) == "retry"
+    assert _pending("whatsapp.send") == [{"contact": "Ana", "messages": ["dos", "tres"]}]
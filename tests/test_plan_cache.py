@@ -0,0 +1,27 @@
+from .. import db
+from ..plan_cache import PlanCache, cacheable
+
+
+def test_cacheable():
+    assert cacheable({"actions": [{"name": "spotify.play", "args": {"query": "x"}}]})
+    assert not cacheable({"response": "Son las 10:00", "actions": []})
+    assert not cacheable({"actions": [{"name": "reminder.add", "args": {}}]})
+
+
+def test_action_less_plan_is_not_replayed():
+    cache = PlanCache(max_entries=8, ttl_s=60, persist=False)
+    cache.put("¿qué hora es?", {"response": "Son las 10:00", "actions": []})
+    assert cache.get("¿qué hora es?") is None
+
+
+def test_prune_persisted_plans(data_dir):
+    cache = PlanCache(max_entries=2, ttl_s=60, persist=True)
+    for text in ("pon a", "pon b", "pon c"):
+        cache.put(text, {"actions": [{"name": "spotify.play", "args": {"query": text}}]})
+    cache.put("pon viejo", {"actions": [{"name": "spotify.play", "args": {}}]}, ttl_s=-1)
+    db.kv_set("other:key", "not json")
+
+    assert cache.prune() == 2
+    with db.db() as conn:
+        keys = sorted(r[0] for r in conn.execute("SELECT key FROM kv"))
+    assert keys == ["other:key"] + sorted(cache._kv_key(k) for k in ("pon b", "pon c"))
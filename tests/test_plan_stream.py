@@ -0,0 +1,90 @@
+import json
+import random
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from .. import metrics, planner
+from ..planner import PlanStreamParser
+
+PLANS = [
+    {
+        "response": 'Le digo "hola" a Ana y pongo {lo de siempre} \\ ya 😀 ñandú',
+        "actions": [
+            {"name": "whatsapp.send", "args": {"contact": "Ana", "message": 'dice "}{" y \\"no\\" 😀'}, "priority": 60},
+            {"name": "spotify.play", "args": {"query": "[remix] {live} ]}"}, "priority": 50},
+        ],
+        "constraints": {},
+    },
+    {"response": "", "actions": [], "constraints": {"nota": "sin acciones {}"}},
+    {"actions": [{"name": "reminder.add", "args": {"text": "a\nb\tc", "run_at": "2030-01-01T00:00:00+00:00"}}],
+     "response": "Listo: éè 🎵"},
+]
+
+
+def _chunks(text, rng):
+    i = 0
+    while i < len(text):
+        n = rng.randint(1, 7)
+        yield text[i:i + n]
+        i += n
+
+
+def _run(raw, rng):
+    parser = PlanStreamParser()
+    deltas, actions = [], []
+    for chunk in _chunks(raw, rng):
+        for kind, data in parser.feed(chunk):
+            if kind == "response":
+                # Never a lone half of a surrogate pair.
+                assert not any("\ud800" <= ch <= "\udfff" for ch in data)
+                deltas.append(data)
+            else:
+                actions.append(data)
+    return "".join(deltas), actions
+
+
+@pytest.mark.parametrize("plan", PLANS)
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_random_chunking(plan, ensure_ascii):
+    # ensure_ascii=True writes non-ASCII as \uXXXX (emoji as surrogate pairs).
+    raw = "Aquí va el plan:\n" + json.dumps(plan, ensure_ascii=ensure_ascii, indent=1) + "\nfin"
+    for seed in range(200):
+        response, actions = _run(raw, random.Random(seed))
+        assert response == plan["response"]
+        assert actions == plan["actions"]
+
+
+def test_one_char_at_a_time_and_whole():
+    plan = PLANS[0]
+    raw = json.dumps(plan)
+    for size in (1, len(raw)):
+        parser = PlanStreamParser()
+        events = [e for i in range(0, len(raw), size) for e in parser.feed(raw[i:i + size])]
+        assert "".join(d for k, d in events if k == "response") == plan["response"]
+        assert [d for k, d in events if k == "action"] == plan["actions"]
+        assert parser.response == plan["response"]
+
+
+def test_stream_records_usage_from_final_chunk(monkeypatch):
+    def chunk(content=None, usage=None):
+        choices = [SimpleNamespace(delta=SimpleNamespace(content=content))] if content else []
+        return SimpleNamespace(choices=choices, usage=usage)
+
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return iter([chunk("{"), chunk("}"), chunk(usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(planner, "_get_client", lambda: client)
+    tokens = metrics.Counter("t", "t")
+    monkeypatch.setattr(metrics, "LLM_TOKENS", tokens)
+
+    pieces = []
+    planner._complete_stream([{"role": "user", "content": "hola"}], pieces.append, threading.Event())
+    assert "".join(pieces) == "{}"
+    assert calls[0]["stream_options"] == {"include_usage": True}
+    assert sorted(tokens._values.values()) == [3, 12]
@@ -0,0 +1,44 @@
+import pytest
+
+from ..planner import match_intent
+
+
+@pytest.mark.parametrize("text, contact, message", [
+    ("manda a Juan: hola", "Juan", "hola"),
+    ("manda a Juan Pérez: hola", "Juan Pérez", "hola"),
+    ("mándale a Juan Pérez, que llego tarde", "Juan Pérez", "llego tarde"),
+    ("envíale a mi hermano que ya voy", "mi hermano", "ya voy"),
+    ("escríbele a Ana diciendo nos vemos", "Ana", "nos vemos"),
+])
+def test_send_with_delimiter(text, contact, message):
+    plan = match_intent(text)
+    assert plan is not None
+    assert plan["actions"][0]["args"] == {"contact": contact, "message": message}
+
+
+@pytest.mark.parametrize("text", [
+    "manda a Juan Pérez hola",
+    "manda a Juan hola",
+])
+def test_send_without_delimiter_goes_to_llm(text):
+    assert match_intent(text) is None
+
+
+@pytest.mark.parametrize("text", [
+    "recuérdame comprar las dos cervezas",
+    "recuérdame llamar a las tres amigas mañana",
+    "despiértame a las 6:30",
+    "pon una alarma a las 7",
+])
+def test_unsure_times_go_to_llm(text):
+    assert match_intent(text) is None
+
+
+@pytest.mark.parametrize("text", [
+    "despiértame a las 6:30 de la mañana",
+    "pon una alarma a las 07:00",
+    "recuérdame sacar la basura a las tres de la tarde",
+])
+def test_qualified_times_are_planned(text):
+    plan = match_intent(text)
+    assert plan is not None and plan["actions"][0]["name"] in ("alarm.add", "reminder.add")
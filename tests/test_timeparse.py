@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from .. import settings, timeparse
+
+# Sunday 18/10/2026, 10:00 UTC.
+NOW = datetime(2026, 10, 18, 10, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def _utc(monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_TZ", "UTC")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("a las 12 de la noche", datetime(2026, 10, 19, 0, 0)),
+    ("a las 12 de la madrugada", datetime(2026, 10, 19, 0, 0)),
+    ("a las 12 am", datetime(2026, 10, 19, 0, 0)),
+    ("a las 12 de la tarde", datetime(2026, 10, 18, 12, 0)),
+    ("a las 11 de la noche", datetime(2026, 10, 18, 23, 0)),
+    ("a las 0:30", datetime(2026, 10, 19, 0, 30)),
+    ("a las 00:30", datetime(2026, 10, 19, 0, 30)),
+    ("a las 08:15", datetime(2026, 10, 19, 8, 15)),
+    ("a las 13:00", datetime(2026, 10, 18, 13, 0)),
+    ("a las 5", datetime(2026, 10, 18, 17, 0)),
+    ("a las 11", datetime(2026, 10, 18, 11, 0)),
+    ("mañana a las 8 de la mañana", datetime(2026, 10, 19, 8, 0)),
+    ("a medianoche", datetime(2026, 10, 19, 0, 0)),
+])
+def test_clock_times(text, expected):
+    when = timeparse.parse(text, now=NOW)
+    assert when is not None
+    assert when.at.replace(tzinfo=None) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "comprar las dos cervezas",
+    "llamar a las tres amigas mañana",
+    "comprar las 2 cervezas",
+])
+def test_quantities_are_not_times(text):
+    assert timeparse.parse(text, now=NOW) is None
+
+
+@pytest.mark.parametrize("text, ambiguous", [
+    ("a las 7", True),
+    ("a las 6:30", True),
+    ("a las tres", True),
+    ("a las 7 de la mañana", False),
+    ("a las 06:30", False),
+    ("a las 19", False),
+    ("en 10 minutos", False),
+])
+def test_bare_hours_are_ambiguous(text, ambiguous):
+    assert timeparse.parse(text, now=NOW).ambiguous is ambiguous
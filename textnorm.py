@@ -0,0 +1,11 @@
+import re
+import unicodedata
+
+
+def normalize(s: str) -> str:
+    """Lowercase, strip accents and collapse whitespace."""
+    s = s.strip().lower()
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    s = re.sub(r"\s+", " ", s)
+    return s
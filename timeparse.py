@@ -0,0 +1,186 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import List, Optional, Tuple
+
+from . import settings
+
+
+_NUM_WORDS = {
+    "un": 1, "una": 1, "uno": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5,
+    "seis": 6, "siete": 7, "ocho": 8, "nueve": 9, "diez": 10, "once": 11,
+    "doce": 12, "quince": 15, "veinte": 20, "treinta": 30, "cuarenta": 40,
+    "cuarenta y cinco": 45,
+}
+_NUM = r"\d{1,3}|cuarenta y cinco|" + "|".join(sorted(_NUM_WORDS, key=len, reverse=True))
+
+_WEEKDAYS = {
+    "lunes": 0, "martes": 1, "miercoles": 2, "miércoles": 2, "jueves": 3,
+    "viernes": 4, "sabado": 5, "sábado": 5, "domingo": 6,
+}
+
+_RELATIVE_RE = re.compile(
+    rf"\b(?:en|dentro de)\s+(?:(?P<half>media)\s+hora|(?P<n>{_NUM})\s+"
+    r"(?P<unit>segundos?|seg|minutos?|mins?|horas?|hrs?|d[ií]as?)(?:\s+y\s+media)?)\b",
+    re.IGNORECASE,
+)
+
+_CLOCK_RE = re.compile(
+    rf"\b(?:(?P<at>a|para)\s+)?(?:las?\s+)(?P<h>\d{{1,2}}|{'|'.join(k for k in _NUM_WORDS if _NUM_WORDS[k] <= 12)})"
+    r"(?::(?P<m>\d{2}))?"
+    r"(?:\s+y\s+(?P<plus>media|cuarto|\d{1,2})|\s+menos\s+(?P<minus>cuarto|\d{1,2}))?"
+    r"(?:\s*(?P<ampm>a\.?\s?m\.?|p\.?\s?m\.?|de\s+la\s+(?:ma[nñ]ana|tarde|noche|madrugada)))?\b",
+    re.IGNORECASE,
+)
+
+# What may follow a bare word-number hour ("a las tres") for it to be a time
+# and not a quantity ("a las tres amigas").
+_TIME_TAIL_RE = re.compile(
+    r"\s*(?:$|[,.;:!?)]|(?:de|del|el|este|esta|hoy|ma[nñ]ana|pasado|para|y|en|que|por)\b)",
+    re.IGNORECASE,
+)
+
+_NAMED_TIME_RE = re.compile(r"\b(?:a|al|para\s+el|para)\s+(?P<name>mediod[ií]a|medianoche)\b", re.IGNORECASE)
+
+_DAY_RE = re.compile(
+    r"\b(?:(?P<rel>pasado\s+ma[nñ]ana|ma[nñ]ana|hoy)|(?:el\s+)?(?P<wd>lunes|martes|mi[eé]rcoles|jueves|viernes|s[aá]bado|domingo))\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class When:
+    at: datetime
+    spans: List[Tuple[int, int]]
+    # A bare "a las 7": resolved to the next 7:00 or 19:00, but the user may
+    # have meant the other one.
+    ambiguous: bool = False
+
+    def strip_from(self, text: str) -> str:
+        """Return ``text`` with the matched time expressions removed."""
+        out = text
+        for a, b in sorted(self.spans, reverse=True):
+            out = out[:a] + " " + out[b:]
+        return re.sub(r"\s+", " ", out).strip(" ,.;")
+
+    def utc_iso(self) -> str:
+        return self.at.astimezone(timezone.utc).isoformat()
+
+
+def local_tz() -> tzinfo:
+    try:
+        from zoneinfo import ZoneInfo
+
+        return ZoneInfo(settings.LOCAL_TZ)
+    except Exception:
+        return timezone.utc
+
+
+def _num(s: str) -> int:
+    s = s.lower()
+    return int(s) if s.isdigit() else _NUM_WORDS[s]
+
+
+def _relative(text: str, now: datetime) -> Optional[When]:
+    m = _RELATIVE_RE.search(text)
+    if not m:
+        return None
+    now = now.replace(microsecond=0)
+    if m.group("half"):
+        return When(now + timedelta(minutes=30), [m.span()])
+    n = _num(m.group("n"))
+    unit = m.group("unit").lower()
+    if unit.startswith("s"):
+        delta = timedelta(seconds=n)
+    elif unit.startswith("m"):
+        delta = timedelta(minutes=n)
+    elif unit.startswith("h"):
+        delta = timedelta(hours=n)
+    else:
+        delta = timedelta(days=n)
+    if m.group(0).lower().endswith("y media"):
+        delta += {"h": timedelta(minutes=30), "d": timedelta(hours=12)}.get(unit[0], timedelta(0))
+    return When(now + delta, [m.span()])
+
+
+def _clock(text: str) -> Optional[Tuple[int, int, Optional[str], Tuple[int, int]]]:
+    m = _NAMED_TIME_RE.search(text)
+    if m:
+        return (12 if m.group("name").lower().startswith("medio") else 0), 0, "fixed", m.span()
+
+    for m in _CLOCK_RE.finditer(text):
+        raw_h = m.group("h")
+        h = _num(raw_h)
+        mi = int(m.group("m")) if m.group("m") else 0
+        if h > 23 or mi > 59:
+            continue
+        plus, minus = m.group("plus"), m.group("minus")
+        if not (m.group("m") or plus or minus or m.group("ampm")):
+            # "las dos cervezas", "a las tres amigas": a number, not a time.
+            if not m.group("at"):
+                continue
+            if not raw_h.isdigit() and not _TIME_TAIL_RE.match(text, m.end()):
+                continue
+        if plus:
+            mi += 30 if plus.lower() == "media" else 15 if plus.lower() == "cuarto" else int(plus)
+        if minus:
+            mi -= 15 if minus.lower() == "cuarto" else int(minus)
+        if mi < 0:
+            h, mi = h - 1, mi + 60
+        h, mi = (h + mi // 60) % 24, mi % 60
+
+        ampm = (m.group("ampm") or "").lower().replace(" ", "").replace(".", "")
+        if ampm:
+            if h == 12:
+                # 12 de la noche/madrugada (and 12 am) is midnight.
+                h = 0 if ("noche" in ampm or "madrugada" in ampm or ampm == "am") else 12
+            elif (ampm == "pm" or "tarde" in ampm or "noche" in ampm) and h < 12:
+                h += 12
+            ampm = "fixed"
+        elif h > 12 or h == 0 or raw_h.startswith("0"):
+            # 24h notation: "a las 17", "a las 0:30", "a las 08:15".
+            ampm = "fixed"
+        return h, mi, (ampm or None), m.span()
+    return None
+
+
+def parse(text: str, now: Optional[datetime] = None) -> Optional[When]:
+    """Parse a Spanish time expression ("en 10 minutos", "mañana a las 8",
+    "el viernes a las 5 y media de la tarde") into an aware datetime.
+    """
+    tz = local_tz()
+    now = (now or datetime.now(timezone.utc)).astimezone(tz)
+
+    rel = _relative(text, now)
+    if rel is not None:
+        return rel
+
+    clock = _clock(text)
+    if clock is None:
+        return None
+    h, mi, mode, clock_span = clock
+
+    # "mañana" inside "de la mañana" is a time of day, not a day.
+    day_offset: Optional[int] = None
+    spans = [clock_span]
+    for d in _DAY_RE.finditer(text):
+        if clock_span[0] <= d.start() < clock_span[1]:
+            continue
+        if d.group("rel"):
+            rel_word = d.group("rel").lower()
+            day_offset = 0 if rel_word == "hoy" else 2 if rel_word.startswith("pasado") else 1
+        else:
+            wd = _WEEKDAYS[d.group("wd").lower()]
+            day_offset = (wd - now.weekday()) % 7 or 7
+        spans.append(d.span())
+        break
+
+    base = (now + timedelta(days=day_offset or 0)).replace(hour=h, minute=mi, second=0, microsecond=0)
+    if mode is None and h < 12:
+        # "a las 5" with no qualifier: the next 5:00 or 17:00 still ahead.
+        later = base + timedelta(hours=12)
+        if base <= now < later:
+            base = later
+    if day_offset is None and base <= now:
+        base += timedelta(days=1)
+    return When(base, spans, ambiguous=mode is None)
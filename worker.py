@@ -0,0 +1,151 @@
+import asyncio
+import os
+import socket
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+from . import settings, db, metrics
+from .orchestrator import orchestrator
+from .browser import browser_manager, preload as preload_playwright, prewarm_services, SERVICE_URLS
+from .governor import governor
+from .routing import network_stats
+from .screenshots import ShotOptions, parse_options, screenshot_cache
+from .background import scheduler, retention_loop
+from .actions.contacts import contact_index
+from .actions.selectors import selector_stats
+from .actions.spotify import track_cache
+from .actions.timing import step_timings
+
+
+async def start_automation(stop_event: asyncio.Event) -> List[asyncio.Task]:
+    """Start everything that drives the browsers: the queue workers, the
+    scheduler, retention, the governor and the optional prewarm."""
+    await orchestrator.start()
+    tasks = [
+        asyncio.create_task(scheduler.run(stop_event), name="scheduler"),
+        asyncio.create_task(retention_loop(stop_event), name="retention"),
+        asyncio.create_task(governor.run(stop_event), name="browser-governor"),
+    ]
+    if settings.STARTUP_WARMUP:
+        tasks.append(asyncio.create_task(asyncio.to_thread(preload_playwright), name="warm-up-playwright"))
+    names = prewarm_services()
+    if names:
+        tasks.append(asyncio.create_task(browser_manager.prewarm(names), name="browser-prewarm"))
+    return tasks
+
+
+async def stop_automation() -> None:
+    await orchestrator.stop()
+    await browser_manager.close()
+
+
+def automation_stats() -> Dict[str, Any]:
+    return {
+        "scheduler": scheduler.stats(),
+        "orchestrator": orchestrator.stats(),
+        "whatsapp_contacts": contact_index.stats(),
+        "spotify_tracks": track_cache.stats(),
+        "selectors": selector_stats.stats(),
+        "action_steps": step_timings.stats(),
+        "network": network_stats(),
+        "screenshots": screenshot_cache.stats(),
+        "browser_governor": governor.stats(),
+    }
+
+
+async def screenshot_response(service: str, opts: ShotOptions, if_none_match: Optional[str]) -> Response:
+    shot = await screenshot_cache.get(service, opts)
+    headers = {"ETag": shot.etag, "Cache-Control": f"private, max-age={int(settings.SCREENSHOT_TTL_S)}"}
+    if if_none_match and shot.etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=shot.body, media_type=shot.media_type, headers=headers)
+
+
+# Control API of the automation worker, served on WORKER_SOCKET only; the API
+# processes (JARVIS_ROLE=api) authenticate the user and forward here.
+app = FastAPI(title="Jarvis worker")
+
+_stop_event = asyncio.Event()
+_bg_tasks: List[asyncio.Task] = []
+
+
+@app.on_event("startup")
+async def _startup() -> None:
+    db.init_db()
+    db.event_writer.start()
+    _stop_event.clear()
+    _bg_tasks[:] = await start_automation(_stop_event)
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    _stop_event.set()
+    for t in _bg_tasks:
+        t.cancel()
+    await stop_automation()
+    await asyncio.to_thread(db.event_writer.stop)
+    db.close_pool()
+
+
+@app.get("/status")
+async def status():
+    return {"browsers": browser_manager.readiness()}
+
+
+@app.get("/stats")
+async def stats():
+    return JSONResponse(automation_stats())
+
+
+@app.post("/wake")
+async def wake():
+    orchestrator.wake()
+    return {"ok": True}
+
+
+@app.get("/screenshot/{service}")
+async def screenshot(
+    service: str,
+    if_none_match: Optional[str] = Header(default=None),
+    fmt: str = "png",
+    quality: Optional[int] = None,
+    full: bool = True,
+    clip: Optional[str] = None,
+):
+    if service not in SERVICE_URLS:
+        raise HTTPException(status_code=404, detail=f"Servicio desconocido: {service}")
+    try:
+        opts = parse_options(fmt, quality, full, clip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await screenshot_response(service, opts, if_none_match)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def _bind(path: str) -> socket.socket:
+    """Bind the control socket owner-only. uvicorn's own ``uds=`` makes it
+    0666; chmod before listen() leaves no window where others can connect."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)  # left by the previous run (uvicorn only removes its own uds=)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    os.chmod(path, 0o600)
+    return sock
+
+
+def main() -> None:
+    import uvicorn
+
+    sock = _bind(settings.WORKER_SOCKET)
+    uvicorn.run(app, fd=sock.fileno(), log_level="info")
+
+
+if __name__ == "__main__":
+    main()